@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import changes, feed, invalidation, lookups, membership  # noqa: F401 - registers signal receivers
@@ -0,0 +1,90 @@
+"""
+Async read-only endpoints under /api/async/
+
+These mirror the list/detail responses of the DRF viewsets for markets,
+positions and groups. Database work is awaited through Django's async ORM
+(or sync_to_async where DRF pagination is reused). Django still runs those
+queries on one thread per worker, so serving them from core.asgi does not
+raise database-bound throughput; what it buys is that slow clients hold a
+coroutine instead of a whole worker (see benchmarks/README.md). The
+deployment therefore stays on WSGI sync workers, which serve these views
+too; route /api/async/ to a separate uvicorn process if slow clients
+become the bottleneck.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .group_serializers import GroupListSerializer
+from .group_views import GroupViewSet
+from .lookups import get_market
+from .models import Market, Position
+from .pagination import GroupCursorPagination
+from .renderers import ORJSONRenderer
+from .serializers import MarketSerializer, PositionSerializer
+
+
+def _json_response(data, status=200):
+    """Render with the same orjson renderer the DRF views use"""
+    return HttpResponse(ORJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+async def _authenticate(request):
+    """Wrap a Django request for DRF and run the configured authenticators"""
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    await sync_to_async(lambda: drf_request.user)()
+    return drf_request
+
+
+def _not_authenticated():
+    return _json_response(
+        {'detail': 'Authentication credentials were not provided.'}, status=401
+    )
+
+
+@require_GET
+async def market_list(request):
+    markets = [market async for market in Market.objects.prefetch_related('outcomes')]
+    return _json_response(MarketSerializer(markets, many=True).data)
+
+
+@require_GET
+async def market_detail(request, pk):
+    market = await sync_to_async(get_market)(pk)
+    if market is None:
+        return _json_response({'detail': 'Not found.'}, status=404)
+    return _json_response(MarketSerializer(market).data)
+
+
+@require_GET
+async def position_list(request):
+    try:
+        drf_request = await _authenticate(request)
+    except exceptions.AuthenticationFailed as exc:
+        return _json_response({'detail': str(exc.detail)}, status=401)
+    if not drf_request.user.is_authenticated:
+        return _not_authenticated()
+    
+    positions = [
+        position async for position in
+        Position.objects.filter(user=drf_request.user).select_related('market', 'outcome')
+    ]
+    return _json_response(PositionSerializer(positions, many=True).data)
+
+
+@require_GET
+async def group_list(request):
+    try:
+        drf_request = await _authenticate(request)
+    except exceptions.AuthenticationFailed as exc:
+        return _json_response({'detail': str(exc.detail)}, status=401)
+    
+    view = GroupViewSet(request=drf_request, format_kwarg=None, action='list')
+    paginator = GroupCursorPagination()
+    page = await sync_to_async(paginator.paginate_queryset)(view.get_queryset(), drf_request, view)
+    serializer = GroupListSerializer(page, many=True, context={'request': drf_request})
+    return _json_response(paginator.get_paginated_response(serializer.data).data)
@@ -0,0 +1,258 @@
+"""
+Write-behind AuditLog writer
+
+log_action() queues an AuditLog entry in-process and returns immediately.
+A background thread flushes the queue with bulk_create once it holds
+AUDIT_LOG_BATCH_SIZE entries or every AUDIT_LOG_FLUSH_INTERVAL seconds,
+and on interpreter shutdown. If the database cannot be written, the batch
+is appended to a JSON-lines spool file and replayed on the next flush.
+
+The spool is shared by every worker on the host, so it is only touched
+under an flock on `<spool>.lock`. A replay claims the spool by renaming
+it to a per-process file, and anything it cannot write yet is appended
+back rather than put back in place. Rows are inserted in bulk with a
+row-by-row fallback: lines that do not parse or that the database rejects
+(IntegrityError/DataError) go to `<spool>.rejected` instead of blocking
+the rows behind them.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DatabaseError, DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogWriter:
+    """Buffers AuditLog rows and writes them from a background thread"""
+
+    def __init__(self, batch_size, flush_interval, spool_path):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = str(spool_path)
+        self._pending = []
+        self._cond = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+    def enqueue(self, entry):
+        with self._cond:
+            self._ensure_thread()
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def close(self):
+        """Stop the background thread after writing everything still queued"""
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                batch, self._pending = self._pending, []
+            else:
+                self._stopping = True
+                self._cond.notify()
+                batch = None
+        if batch is None:
+            self._thread.join()
+            self._thread = None
+        elif batch:
+            self._write(batch)
+
+    def _ensure_thread(self):
+        # Gunicorn forks workers after import, so each process needs its own thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._thread is not None and self._pid == os.getpid():
+            logger.error('Audit log writer thread died, restarting it')
+        self._pid = os.getpid()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._pending) >= self.batch_size,
+                    timeout=self.flush_interval,
+                )
+                batch, self._pending = self._pending, []
+                stopping = self._stopping
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception:
+                    # Never let one bad flush stop the writer
+                    logger.exception('Audit log flush failed, spooling %d entries', len(batch))
+                    self._spool([_to_record(entry) for entry in batch])
+            if stopping:
+                return
+
+    def _write(self, batch):
+        close_old_connections()
+        records = [_to_record(entry) for entry in batch]
+        try:
+            self.replay_spool()
+        except DatabaseError:
+            logger.exception('Audit log database write failed, spooling %d entries', len(batch))
+            self._spool(records)
+            return
+        remaining = self._insert(records)
+        if remaining:
+            logger.error('Audit log database write failed, spooling %d entries', len(remaining))
+            self._spool(remaining)
+
+    def _insert(self, records):
+        """
+        Insert records, quarantining the ones the database rejects. Returns
+        the records left unwritten because the database is unavailable.
+        """
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create([_from_record(record) for record in records], batch_size=self.batch_size)
+            return []
+        except (IntegrityError, DataError):
+            pass
+        except DatabaseError:
+            return records
+        # Some row is bad: find it one row at a time
+        for index, record in enumerate(records):
+            try:
+                with transaction.atomic():
+                    _from_record(record).save()
+            except (IntegrityError, DataError) as exc:
+                self._reject([json.dumps(record)], exc)
+            except DatabaseError:
+                return records[index:]
+        return []
+
+    @contextmanager
+    def _spool_locked(self):
+        """Serialize spool access between threads and between processes"""
+        with self._spool_lock, open(self.spool_path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spool(self, records):
+        if not records:
+            return
+        with self._spool_locked(), open(self.spool_path, 'a', encoding='utf-8') as spool:
+            spool.writelines(json.dumps(record) + '\n' for record in records)
+
+    def _reject(self, lines, reason):
+        logger.error('Quarantining %d audit log spool lines: %s', len(lines), reason)
+        with self._spool_locked(), open(self.spool_path + '.rejected', 'a', encoding='utf-8') as rejected:
+            rejected.writelines(line.rstrip('\n') + '\n' for line in lines)
+
+    def _claim_spool(self):
+        """Move the spool, and replays left by exited processes, to this process"""
+        claimed_path = f'{self.spool_path}.replaying.{os.getpid()}'
+        with self._spool_locked():
+            paths = [self.spool_path] if os.path.exists(self.spool_path) else []
+            for path in glob.glob(glob.escape(self.spool_path) + '.replaying.*'):
+                if path != claimed_path and not _pid_alive(path.rsplit('.', 1)[-1]):
+                    paths.append(path)
+            if not paths:
+                return None
+            with open(claimed_path, 'a', encoding='utf-8') as claimed:
+                for path in paths:
+                    with open(path, encoding='utf-8') as source:
+                        claimed.write(source.read())
+                    os.remove(path)
+        return claimed_path
+
+    def replay_spool(self):
+        """
+        Insert spooled entries into the database. Returns the number replayed;
+        raises DatabaseError, with the unwritten entries spooled again, if the
+        database is unavailable.
+        """
+        claimed_path = self._claim_spool()
+        if claimed_path is None:
+            return 0
+        with open(claimed_path, encoding='utf-8') as spool:
+            lines = [line for line in spool if line.strip()]
+        records, unparsable = [], []
+        for line in lines:
+            try:
+                record = json.loads(line)
+                _from_record(record)
+            except (ValueError, TypeError, KeyError):
+                unparsable.append(line)
+            else:
+                records.append(record)
+        if unparsable:
+            self._reject(unparsable, 'unparsable line')
+        remaining = self._insert(records)
+        # Unwritten entries go back to the end of the shared spool; other
+        # workers may have appended to it in the meantime
+        self._spool(remaining)
+        os.remove(claimed_path)
+        if remaining:
+            raise DatabaseError(f'{len(remaining)} spooled audit log entries could not be written')
+        return len(records)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _to_record(entry):
+    return {
+        'user_id': entry.user_id,
+        'action': entry.action,
+        'target_object': entry.target_object,
+        'details': entry.details,
+        'ip_address': entry.ip_address,
+        'timestamp': entry.timestamp.isoformat(),
+    }
+
+
+def _from_record(record):
+    timestamp = parse_datetime(record['timestamp'])
+    if timestamp is None:
+        raise ValueError('invalid timestamp')
+    return AuditLog(**{**record, 'timestamp': timestamp})
+
+
+audit_writer = AuditLogWriter(
+    batch_size=settings.AUDIT_LOG_BATCH_SIZE,
+    flush_interval=settings.AUDIT_LOG_FLUSH_INTERVAL,
+    spool_path=settings.AUDIT_LOG_SPOOL_PATH,
+)
+atexit.register(audit_writer.close)
+
+
+def log_action(user, action, target_object, details=None, ip_address=None):
+    """Record an AuditLog entry, queued for a batched write unless write-behind is disabled"""
+    entry = AuditLog(
+        user=user,
+        action=action,
+        target_object=target_object,
+        details=details,
+        ip_address=ip_address,
+        timestamp=timezone.now(),
+    )
+    if settings.AUDIT_LOG_WRITE_BEHIND:
+        audit_writer.enqueue(entry)
+    else:
+        entry.save()
@@ -0,0 +1,155 @@
+"""
+Monthly partitions for the AuditLog table
+
+On PostgreSQL api_auditlog is natively partitioned by RANGE (timestamp),
+one partition per calendar month plus a DEFAULT partition. Expired months
+are archived to gzipped JSON-lines segment files and removed by detaching
+and dropping the partition. Other databases keep a single table; expired
+months are archived the same way and removed with one range DELETE on the
+timestamp index.
+
+Rows land in the DEFAULT partition when their month has no partition yet
+(a clock skew, a late batch, or the retention job not having run). Postgres
+refuses to create a partition whose range the DEFAULT partition already
+holds rows for, so ensure_partition() moves those rows into the new
+partition before attaching it, and retention counts DEFAULT rows as part
+of their month.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection, transaction
+from .models import AuditLog
+
+PARTITION_PREFIX = 'api_auditlog_p'
+DEFAULT_PARTITION = 'api_auditlog_default'
+
+
+def month_start(value):
+    """First instant (UTC) of the month containing `value`"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def is_partitioned():
+    """True when api_auditlog is a native PostgreSQL partitioned table"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [AuditLog._meta.db_table])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def ensure_partition(month):
+    """
+    Create the partition for `month` if it does not exist yet, moving any
+    rows the DEFAULT partition holds for that month into it
+    """
+    table, name, bounds = AuditLog._meta.db_table, partition_name(month), [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_class WHERE relname = %s", [name])
+        if cursor.fetchone():
+            return
+        cursor.execute(
+            f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1', bounds
+        )
+        if not cursor.fetchone():
+            cursor.execute(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)', bounds)
+            return
+        # Build the partition detached, then attach it once the DEFAULT partition no longer overlaps
+        cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s '
+            f'RETURNING *) INSERT INTO {name} SELECT * FROM moved',
+            bounds
+        )
+        cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', bounds)
+
+
+def default_months(before=None):
+    """Months that have rows in the DEFAULT partition, oldest first"""
+    query = f"""SELECT DISTINCT date_trunc('month', "timestamp" AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}"""
+    params = []
+    if before is not None:
+        query += ' WHERE "timestamp" < %s'
+        params.append(before)
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return sorted(row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall())
+
+
+def partition_months():
+    """Months that currently have a partition, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+            "WHERE parent.relname = %s",
+            [AuditLog._meta.db_table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return sorted(
+        datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m').replace(tzinfo=dt_timezone.utc)
+        for name in names if name.startswith(PARTITION_PREFIX)
+    )
+
+
+def stored_months(before):
+    """Months older than `before` that still hold audit rows"""
+    if is_partitioned():
+        months = {month for month in partition_months() if month < before}
+        return sorted(months.union(default_months(before)))
+    oldest = AuditLog.objects.filter(timestamp__lt=before).order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return []
+    months = []
+    month = month_start(oldest)
+    while month < before:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def archive_month(month, archive_dir):
+    """Write one month of audit rows to a gzipped JSON-lines file. Returns (path, rows)."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'auditlog-{month:%Y-%m}.jsonl.gz')
+    rows = AuditLog.objects.filter(
+        timestamp__gte=month, timestamp__lt=add_months(month, 1)
+    ).order_by('timestamp', 'id').values(
+        'id', 'user_id', 'action', 'target_object', 'details', 'ip_address', 'timestamp'
+    )
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as archive:
+        for row in rows.iterator(chunk_size=5000):
+            row['timestamp'] = row['timestamp'].isoformat()
+            archive.write(json.dumps(row) + '\n')
+            count += 1
+    return path, count
+
+
+def drop_month(month):
+    """Remove one month of audit rows: drop its partition, or one range DELETE"""
+    if is_partitioned():
+        with transaction.atomic(), connection.cursor() as cursor:
+            if month in partition_months():
+                cursor.execute(f'ALTER TABLE {AuditLog._meta.db_table} DETACH PARTITION {partition_name(month)}')
+                cursor.execute(f'DROP TABLE {partition_name(month)}')
+            cursor.execute(
+                f'DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s',
+                [month, add_months(month, 1)]
+            )
+    else:
+        AuditLog.objects.filter(timestamp__gte=month, timestamp__lt=add_months(month, 1)).delete()
@@ -0,0 +1,86 @@
+"""
+Set-based banning and unbanning of users
+"""
+from django.db import transaction
+from django.utils import timezone
+from .caching import invalidate_tags
+from .lookups import PROFILES_TAG
+from .models import Profile, AuditLog
+
+BULK_BATCH_SIZE = 1000
+
+
+def _lock_profiles(profiles, is_banned):
+    """
+    Lock the profiles in `profiles` whose is_banned matches, in primary key
+    order, so a concurrent call waits and then no longer matches them.
+    Returns [(profile id, username)].
+    """
+    return list(
+        Profile.objects.select_for_update(of=('self',))
+        .filter(pk__in=profiles.filter(is_banned=is_banned).values('pk'), is_banned=is_banned)
+        .order_by('pk')
+        .values_list('id', 'user__username')
+    )
+
+
+def bulk_ban_users(profiles, banned_by, ban_reason=None):
+    """
+    Ban every profile in `profiles` that is not banned yet with one UPDATE and
+    one bulk AuditLog insert. The rows are locked first, so overlapping calls
+    ban and audit each user once. Returns the number of users banned.
+    """
+    now = timezone.now()
+    reason_text = f". Reason: {ban_reason}" if ban_reason else ""
+    with transaction.atomic():
+        rows = _lock_profiles(profiles, is_banned=False)
+        if not rows:
+            return 0
+        updated = Profile.objects.filter(id__in=[profile_id for profile_id, _ in rows], is_banned=False).update(
+            is_banned=True, ban_reason=ban_reason, banned_at=now, banned_by=banned_by
+        )
+        if updated != len(rows):
+            # Databases without row locks: keep only the rows this UPDATE changed
+            changed = set(
+                Profile.objects.filter(
+                    id__in=[profile_id for profile_id, _ in rows], banned_at=now, banned_by=banned_by
+                ).values_list('id', flat=True)
+            )
+            rows = [row for row in rows if row[0] in changed]
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=banned_by,
+                action='BAN_USER',
+                target_object=f"User: {username}",
+                details=f"User {username} banned by {banned_by.username}{reason_text}"
+            )
+            for _, username in rows
+        ], batch_size=BULK_BATCH_SIZE)
+        transaction.on_commit(lambda: invalidate_tags(PROFILES_TAG))
+    return len(rows)
+
+
+def bulk_unban_users(profiles, unbanned_by):
+    """
+    Unban every banned profile in `profiles` with one UPDATE and one bulk
+    AuditLog insert. The rows are locked first, so overlapping calls unban
+    and audit each user once. Returns the number of users unbanned.
+    """
+    with transaction.atomic():
+        rows = _lock_profiles(profiles, is_banned=True)
+        if not rows:
+            return 0
+        Profile.objects.filter(id__in=[profile_id for profile_id, _ in rows], is_banned=True).update(
+            is_banned=False, ban_reason=None, banned_at=None, banned_by=None
+        )
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=unbanned_by,
+                action='UNBAN_USER',
+                target_object=f"User: {username}",
+                details=f"User {username} unbanned by {unbanned_by.username}"
+            )
+            for _, username in rows
+        ], batch_size=BULK_BATCH_SIZE)
+        transaction.on_commit(lambda: invalidate_tags(PROFILES_TAG))
+    return len(rows)
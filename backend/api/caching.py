@@ -0,0 +1,348 @@
+"""
+Two-tier cache for hot lookups
+
+A bounded in-process LRU sits in front of the shared Django cache
+(CACHES['default']). Reads try the LRU, then the shared tier, then the
+loader. Concurrent misses for the same key load once (single-flight: a
+per-process wait plus a short lock in the shared tier), and TTLs are
+jittered so entries written together do not expire together.
+
+Entries can carry tags. invalidate_tags() bumps each tag's version in the
+shared tier, so shared entries written under an older version read as
+misses. Local entries are dropped in this process and, through the
+invalidation bus (api.invalidation) when it is enabled, in every other
+worker; TIERED_CACHE_LOCAL_TTL bounds staleness if a message is lost.
+Tag versions are read before a loader runs, and the result is dropped if
+any of them moved during the load, so a value read before a concurrent
+invalidation is never stored. Loaders read from the primary database,
+never from a lagging replica.
+
+Usage:
+    @cached('markets', ttl=60, tags=lambda market_id: [f'market:{market_id}'])
+    def get_market(market_id):
+        ...
+"""
+import functools
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from .db_routers import use_primary
+
+MISSING = object()
+KEY_PREFIX = 'tc:'
+TAG_PREFIX = 'tc:tag:'
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'local_hits': 0, 'shared_hits': 0, 'misses': 0})
+
+
+def _count(namespace, counter):
+    with _stats_lock:
+        _stats[namespace][counter] += 1
+
+
+def cache_stats():
+    """Hit/miss counters per namespace for this process"""
+    with _stats_lock:
+        return {namespace: dict(counters) for namespace, counters in _stats.items()}
+
+
+def jittered(ttl):
+    """Spread expiry by +/- TIERED_CACHE_JITTER of the TTL"""
+    jitter = settings.TIERED_CACHE_JITTER
+    return max(1, int(ttl * random.uniform(1 - jitter, 1 + jitter)))
+
+
+class LocalLRU:
+    """Thread-safe LRU of key -> (expires_at, value, tags) with a tag index"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tagged = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tuple(tags))
+            for tag in tags:
+                self._tagged[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_tagged(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tagged.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+
+local_cache = LocalLRU(settings.TIERED_CACHE_LOCAL_MAX_ENTRIES)
+
+# Set by api.invalidation to broadcast local invalidations to other workers
+bus = None
+
+
+def _store_local(full_key, value, ttl, tags):
+    if bus is not None:
+        # Only processes holding local entries need to hear invalidations
+        bus.ensure_started()
+    local_cache.set(full_key, value, min(ttl, settings.TIERED_CACHE_LOCAL_TTL), tags)
+
+
+def _tag_versions(tags, create=False):
+    """Current version token of each tag in the shared tier"""
+    tag_keys = [TAG_PREFIX + tag for tag in tags]
+    versions = shared_cache.get_many(tag_keys)
+    if create:
+        for tag_key in tag_keys:
+            if tag_key not in versions:
+                shared_cache.add(tag_key, uuid.uuid4().hex, None)
+                versions[tag_key] = shared_cache.get(tag_key)
+    return versions
+
+
+def tag_versions(tags):
+    """Snapshot of the tags' versions, to pass to set() after loading"""
+    return _tag_versions(tags, create=True) if tags else {}
+
+
+def invalidate_tags(*tags):
+    """Expire every entry written under any of the tags"""
+    if not tags:
+        return
+    shared_cache.set_many({TAG_PREFIX + tag: uuid.uuid4().hex for tag in tags}, None)
+    local_cache.delete_tagged(tags)
+    if bus is not None:
+        bus.publish(tags=tags)
+
+
+class TieredCache:
+    """Namespaced get/set/get_or_set over the local and shared tiers"""
+
+    def __init__(self, namespace, ttl=300):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def _key(self, key):
+        return f'{KEY_PREFIX}{self.namespace}:{key}'
+
+    def get(self, key, tags=()):
+        """Return the cached value or MISSING"""
+        full_key = self._key(key)
+        value = local_cache.get(full_key)
+        if value is not MISSING:
+            _count(self.namespace, 'local_hits')
+            return value
+
+        tag_keys = [TAG_PREFIX + tag for tag in tags]
+        found = shared_cache.get_many([full_key, *tag_keys])
+        entry = found.get(full_key)
+        if entry is not None:
+            value, versions = entry
+            if all(found.get(tag_key) == versions.get(tag_key) for tag_key in tag_keys):
+                _count(self.namespace, 'shared_hits')
+                _store_local(full_key, value, self.ttl, tags)
+                return value
+        _count(self.namespace, 'misses')
+        return MISSING
+
+    def set(self, key, value, ttl=None, tags=(), versions=None):
+        """
+        Store a value. `versions` is the tag snapshot (tag_versions()) taken
+        before the value was loaded; if a tag has moved since, the value may
+        predate the change and is not stored.
+        """
+        self.set_many({key: value}, ttl, tags=lambda _: tags, versions=versions)
+
+    def get_many(self, keys, tags=None):
+        """
+        {key: value} for the keys that are cached; `tags` maps a key to its
+        tags. The shared tier is read with a single get_many.
+        """
+        tags = tags or (lambda key: ())
+        found, missing = {}, {}
+        for key in keys:
+            full_key = self._key(key)
+            value = local_cache.get(full_key)
+            if value is MISSING:
+                missing[full_key] = key
+            else:
+                _count(self.namespace, 'local_hits')
+                found[key] = value
+        if not missing:
+            return found
+
+        key_tags = {full_key: tags(key) for full_key, key in missing.items()}
+        tag_keys = {TAG_PREFIX + tag for entry_tags in key_tags.values() for tag in entry_tags}
+        shared = shared_cache.get_many([*missing, *tag_keys])
+        for full_key, key in missing.items():
+            entry = shared.get(full_key)
+            if entry is not None:
+                value, versions = entry
+                if all(
+                    shared.get(TAG_PREFIX + tag) == versions.get(TAG_PREFIX + tag)
+                    for tag in key_tags[full_key]
+                ):
+                    _count(self.namespace, 'shared_hits')
+                    _store_local(full_key, value, self.ttl, key_tags[full_key])
+                    found[key] = value
+                    continue
+            _count(self.namespace, 'misses')
+        return found
+
+    def set_many(self, values, ttl=None, tags=None, versions=None):
+        """Store {key: value}; `tags` maps a key to its tags, `versions` as for set()"""
+        tags = tags or (lambda key: ())
+        ttl = jittered(ttl or self.ttl)
+        key_tags = {key: tags(key) for key in values}
+        all_tags = {tag for entry_tags in key_tags.values() for tag in entry_tags}
+        current = _tag_versions(all_tags, create=True) if all_tags else {}
+        if versions is not None:
+            moved = {tag_key for tag_key, version in current.items() if versions.get(tag_key) != version}
+            values = {
+                key: value for key, value in values.items()
+                if not any(TAG_PREFIX + tag in moved for tag in key_tags[key])
+            }
+            if not values:
+                return
+        versions = current
+        entries = {}
+        for key, value in values.items():
+            entry_versions = {TAG_PREFIX + tag: versions.get(TAG_PREFIX + tag) for tag in key_tags[key]}
+            entries[self._key(key)] = (value, entry_versions)
+        shared_cache.set_many(entries, ttl)
+        for key, value in values.items():
+            _store_local(self._key(key), value, ttl, key_tags[key])
+
+    def get_many_or_load(self, keys, loader, ttl=None, tags=None):
+        """
+        {key: value} for `keys`; the keys that are not cached are loaded
+        with one loader(missing_keys) call, which returns {key: value}
+        """
+        found = self.get_many(keys, tags)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            versions = tag_versions({tag for key in missing for tag in (tags(key) if tags else ())})
+            with use_primary():
+                loaded = loader(missing)
+            self.set_many(loaded, ttl, tags, versions=versions)
+            found.update(loaded)
+        return found
+
+    def delete(self, *keys):
+        full_keys = [self._key(key) for key in keys]
+        shared_cache.delete_many(full_keys)
+        for full_key in full_keys:
+            local_cache.delete(full_key)
+        if bus is not None:
+            bus.publish(keys=full_keys)
+
+    def get_or_set(self, key, loader, ttl=None, tags=()):
+        """Return the cached value, loading it once across concurrent misses"""
+        value = self.get(key, tags)
+        if value is not MISSING:
+            return value
+
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            # Another thread in this process is loading the same key
+            event.wait(settings.TIERED_CACHE_LOCK_TIMEOUT)
+            value = self.get(key, tags)
+            if value is MISSING:
+                with use_primary():
+                    return loader()
+            return value
+
+        try:
+            # Taken before loading, so an invalidation during the load wins
+            versions = tag_versions(tags)
+            lock_key = self._key(key) + ':lock'
+            if not shared_cache.add(lock_key, 1, settings.TIERED_CACHE_LOCK_TIMEOUT):
+                # Another process is loading it; wait briefly for its result
+                deadline = time.monotonic() + settings.TIERED_CACHE_LOCK_TIMEOUT
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = self.get(key, tags)
+                    if value is not MISSING:
+                        return value
+                lock_key = None
+            try:
+                with use_primary():
+                    value = loader()
+                self.set(key, value, ttl, tags, versions=versions)
+            finally:
+                if lock_key:
+                    shared_cache.delete(lock_key)
+            return value
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+
+def cached(namespace, ttl=300, tags=None, key=None):
+    """
+    Cache a function's result per argument list in the two-tier cache.
+    `key` and `tags` receive the call's arguments; by default the key is
+    the positional arguments joined with ':'. The wrapper gains
+    .invalidate(*args, **kwargs) and .cache (the TieredCache).
+    """
+    def decorator(func):
+        tiered = TieredCache(namespace, ttl)
+        make_key = key or (lambda *args: ':'.join(str(arg) for arg in args))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return tiered.get_or_set(
+                make_key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                tags=tags(*args, **kwargs) if tags else (),
+            )
+
+        wrapper.cache = tiered
+        wrapper.invalidate = lambda *args, **kwargs: tiered.delete(make_key(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,111 @@
+"""
+Change sequence for delta sync of markets and outcomes
+
+Every write to a Market or Outcome row stamps the row's change_seq from one
+monotonically increasing counter (MarketChangeCounter), and deletes leave a
+MarketTombstone stamped from the same counter. A client keeps the highest
+sequence it has seen and asks /api/markets/changes/?since=<seq> for what
+changed after it; each source is read from its change_seq index. The head
+is read from the counter row on every poll (one primary-key lookup), not
+cached: queryset updates and bulk writes are stamped by the database without
+any signal that could invalidate a cached head.
+
+Stamps are assigned by database triggers (migration 0016), so a sequence is
+never visible before every lower one: on Postgres a deferred trigger takes
+the next value at commit and holds the counter row until the commit
+finishes; SQLite has a single writer and stamps inside the statement.
+Queryset updates and bulk inserts are stamped too. The price is one
+counter update per written row, and on Postgres a second row version.
+
+Tombstones older than CHANGES_TOMBSTONE_RETENTION_DAYS are removed by
+`manage.py prune_change_tombstones`, which also re-stamps rows at or below
+the newest pruned sequence so that nothing remains below the watermark. A
+client whose cursor is below it may have missed deletions and must resync
+from since=0.
+"""
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Market, MarketChangeCounter, MarketTombstone, Outcome
+
+
+def change_counter():
+    """(highest committed change sequence, sequence tombstones are pruned through)"""
+    counter = MarketChangeCounter.objects.filter(pk=1).values_list('last_seq', 'pruned_through').first()
+    return counter or (0, 0)
+
+
+def change_head():
+    return change_counter()[0]
+
+
+def pruned_through():
+    return change_counter()[1]
+
+
+def changes_since(since, limit, head=None):
+    """
+    Markets, outcomes and tombstones with change_seq > since, the first
+    `limit` of them in sequence order. Returns (cursor, has_more, markets,
+    outcomes, tombstones); cursor is the last sequence included. `head` is
+    the change_head() the caller already read, if any.
+    """
+    if since >= (change_head() if head is None else head):
+        return since, False, [], [], []
+    sources = (
+        ('market', Market.objects.filter(change_seq__gt=since).prefetch_related('outcomes')),
+        ('outcome', Outcome.objects.filter(change_seq__gt=since)),
+        ('tombstone', MarketTombstone.objects.filter(change_seq__gt=since)),
+    )
+    merged = []
+    for kind, queryset in sources:
+        merged.extend((row.change_seq, kind, row) for row in queryset.order_by('change_seq')[:limit + 1])
+    merged.sort(key=lambda item: item[0])
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    changed = {'market': [], 'outcome': [], 'tombstone': []}
+    for _, kind, row in merged:
+        changed[kind].append(row)
+    cursor = merged[-1][0] if merged else since
+    return cursor, has_more, changed['market'], changed['outcome'], changed['tombstone']
+
+
+def prune_tombstones(before):
+    """
+    Delete tombstones recorded before `before`, then re-stamp the markets and
+    outcomes still at or below the newest one deleted, so a sync from 0 never
+    hands out a cursor below the watermark. Returns the number deleted.
+    """
+    with transaction.atomic():
+        watermark = MarketTombstone.objects.filter(deleted_at__lt=before).aggregate(
+            seq=Max('change_seq')
+        )['seq']
+        if watermark is None:
+            return 0
+        deleted, _ = MarketTombstone.objects.filter(change_seq__lte=watermark).delete()
+        # The stamping triggers assign fresh sequences to the updated rows
+        Market.objects.filter(change_seq__lte=watermark).update(change_seq=F('change_seq'))
+        Outcome.objects.filter(change_seq__lte=watermark).update(change_seq=F('change_seq'))
+        counter, _ = MarketChangeCounter.objects.select_for_update().get_or_create(pk=1)
+        counter.pruned_through = max(counter.pruned_through, watermark)
+        counter.save(update_fields=['pruned_through'])
+    return deleted
+
+
+def _tombstone(kind, instance, market_id, using):
+    # change_seq is assigned by the stamping trigger
+    MarketTombstone.objects.using(using).create(
+        change_seq=0, kind=kind, object_id=instance.pk, market_id=market_id,
+    )
+
+
+@receiver(post_delete, sender=Market)
+def tombstone_market(sender, instance, using, **kwargs):
+    _tombstone('market', instance, instance.pk, using)
+
+
+@receiver(post_delete, sender=Outcome)
+def tombstone_outcome(sender, instance, using, **kwargs):
+    _tombstone('outcome', instance, instance.market_id, using)
@@ -0,0 +1,81 @@
+"""
+Operations dashboard aggregates
+
+refresh_platform_stats() recomputes the hourly trade rollups for the hours
+a late commit could still change and snapshots the open market and
+pending access request counts. get_platform_stats() then reads the
+dashboard numbers with a handful of indexed queries.
+
+A Trade's timestamp is set when it is created but becomes visible when
+its transaction commits, and ids are not committed in order, so a
+high-water mark on either column can skip rows. Each run therefore
+replaces the rollups from LATE_COMMIT_WINDOW before the previous run
+onwards (a range scan on the Trade timestamp index) rather than adding
+new rows on top of them.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from .models import (
+    GroupAccessRequest, Market, PlatformStats, Trade, TradeHourlyRollup, TraderActivity,
+)
+
+# Trades committed more than this long after their timestamp are not counted
+LATE_COMMIT_WINDOW = timedelta(minutes=15)
+
+
+def refresh_platform_stats():
+    """Recompute the recent rollups and refresh the gauges"""
+    now = timezone.now()
+    with transaction.atomic():
+        stats, _ = PlatformStats.objects.select_for_update().get_or_create(pk=1)
+        
+        completed = Trade.objects.filter(status='COMPLETED').order_by()
+        rollups = TradeHourlyRollup.objects.all()
+        if stats.refreshed_at is not None:
+            # Whole hours, so every bucket that is replaced is recounted in full
+            window_start = (stats.refreshed_at - LATE_COMMIT_WINDOW).replace(minute=0, second=0, microsecond=0)
+            completed = completed.filter(timestamp__gte=window_start)
+            rollups = rollups.filter(hour__gte=window_start)
+        
+        hourly = completed.annotate(bucket=TruncHour('timestamp')).values('bucket').annotate(
+            trade_count=Count('id'), volume=Sum('totalValue')
+        )
+        rollups.delete()
+        TradeHourlyRollup.objects.bulk_create([
+            TradeHourlyRollup(hour=row['bucket'], trade_count=row['trade_count'], volume=row['volume'])
+            for row in hourly
+        ])
+        
+        TraderActivity.objects.bulk_create(
+            [
+                TraderActivity(user_id=row['user_id'], last_trade_at=row['last_trade_at'])
+                for row in completed.values('user_id').annotate(last_trade_at=Max('timestamp'))
+            ],
+            update_conflicts=True, unique_fields=['user'], update_fields=['last_trade_at'],
+        )
+        
+        stats.open_markets = Market.objects.filter(status='OPEN').count()
+        stats.pending_access_requests = GroupAccessRequest.objects.filter(status='PENDING').count()
+        stats.refreshed_at = now
+        stats.save()
+    return stats
+
+
+def get_platform_stats():
+    """Dashboard numbers for the last 24 hours, read from the rollups"""
+    since = timezone.now() - timedelta(hours=24)
+    stats = PlatformStats.objects.filter(pk=1).first() or PlatformStats()
+    volume = TradeHourlyRollup.objects.filter(hour__gte=since.replace(minute=0, second=0, microsecond=0)).aggregate(
+        trade_count=Sum('trade_count'), volume=Sum('volume')
+    )
+    return {
+        'volume_24h': volume['volume'] or 0,
+        'trades_24h': volume['trade_count'] or 0,
+        'active_users_24h': TraderActivity.objects.filter(last_trade_at__gte=since).count(),
+        'open_markets': stats.open_markets,
+        'pending_access_requests': stats.pending_access_requests,
+        'refreshed_at': stats.refreshed_at,
+    }
@@ -0,0 +1,39 @@
+"""
+Connection pool statistics
+
+Each worker process owns its own psycopg 3 pool per database alias, so the
+numbers are per process (identified by pid) and cumulative since the pool
+opened.
+"""
+import os
+from django.db import connections
+
+# psycopg_pool counter -> name exposed on /health/
+POOL_STAT_NAMES = {
+    'pool_min': 'min_size',
+    'pool_max': 'max_size',
+    'pool_size': 'size',
+    'pool_available': 'available',
+    'requests_waiting': 'waiting',
+    'requests_num': 'acquisitions',
+    'requests_queued': 'acquisitions_waited',
+    'requests_wait_ms': 'wait_ms',
+    'requests_errors': 'acquisition_timeouts',
+    'usage_ms': 'checkout_ms',
+    'connections_num': 'connections_opened',
+    'connections_errors': 'connection_errors',
+}
+
+
+def pool_stats():
+    """Return {'pid': ..., 'pools': {alias: stats}} for pooled aliases"""
+    pools = {}
+    for alias in connections:
+        if 'pool' not in connections.settings[alias].get('OPTIONS', {}):
+            continue
+        pool = connections[alias].pool
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        pools[alias] = {name: stats.get(key, 0) for key, name in POOL_STAT_NAMES.items()}
+    return {'pid': os.getpid(), 'pools': pools}
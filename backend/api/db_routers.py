@@ -0,0 +1,180 @@
+"""
+Read-replica routing
+
+ReplicaRouter sends ORM reads to the replica aliases configured from
+DATABASE_REPLICA_URLS and every write to ``default``. Reads stay on the
+primary when:
+
+- the current request uses an unsafe method (POST/PUT/PATCH/DELETE),
+- the same client wrote within the last DATABASE_STICKY_SECONDS
+  (read-your-writes), tracked by ReplicaRoutingMiddleware in the cache,
+- the primary has an open transaction,
+- code runs inside ``use_primary()``,
+- or every replica lags more than DATABASE_REPLICA_MAX_LAG seconds.
+
+Each request reads from one replica, chosen by the middleware, so its
+queries see a single consistent snapshot. Cache loaders (api.caching) run
+under ``use_primary()`` so a lagging replica cannot put data back into
+the cache right after an invalidation.
+
+Locally two SQLite files work, e.g.
+DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3
+"""
+import contextvars
+import hashlib
+import logging
+import random
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SynchronousOnlyOperation
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_CACHE_PREFIX = 'db:sticky:'
+
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+# Replica chosen for the current request; None outside requests
+_request_replica = contextvars.ContextVar('request_replica', default=None)
+_replica_lag = {}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+@contextmanager
+def use_primary():
+    """Route all reads in this block to the primary"""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+def _measure_lag(alias):
+    """Seconds the replica is behind its primary (0 for non-Postgres aliases)"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_is_in_recovery() "
+            "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+            "ELSE 0 END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def replica_lag(alias):
+    """Cached lag for a replica; None means it could not be reached"""
+    now = time.monotonic()
+    checked = _replica_lag.get(alias)
+    if checked and now - checked[0] < settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = _measure_lag(alias)
+    except SynchronousOnlyOperation:
+        # Called from the event loop: a caller bug, not an unreachable replica
+        raise
+    except Exception:
+        logger.warning('Replica %s unreachable, routing reads to primary', alias, exc_info=True)
+        lag = None
+    _replica_lag[alias] = (now, lag)
+    return lag
+
+
+def choose_replica():
+    """A healthy replica, or None if there is none"""
+    replicas = healthy_replicas()
+    return random.choice(replicas) if replicas else None
+
+
+def healthy_replicas():
+    max_lag = settings.DATABASE_REPLICA_MAX_LAG
+    healthy = []
+    for alias in replica_aliases():
+        lag = replica_lag(alias)
+        if lag is not None and lag <= max_lag:
+            healthy.append(alias)
+    return healthy
+
+
+class ReplicaRouter:
+    """Send reads to a healthy replica unless the request is pinned to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if _pinned_to_primary.get() or not replica_aliases():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replica = _request_replica.get() or choose_replica()
+        return replica or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+def _sticky_key(request):
+    """Identify the client across requests by its credentials"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return STICKY_CACHE_PREFIX + hashlib.md5(credential.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Pin writes, and reads shortly after a client's write, to the primary;
+    send the other requests' reads to one replica for the whole request
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = _sticky_key(request)
+        is_write = request.method not in SAFE_METHODS
+        pinned = is_write or (key is not None and cache.get(key) is not None)
+        token = _pinned_to_primary.set(pinned)
+        replica_token = _request_replica.set(None if pinned or not replica_aliases() else choose_replica())
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_replica.reset(replica_token)
+            _pinned_to_primary.reset(token)
+        if is_write and key is not None and response.status_code < 400:
+            cache.set(key, True, settings.DATABASE_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = _sticky_key(request)
+        is_write = request.method not in SAFE_METHODS
+        pinned = is_write or (key is not None and await cache.aget(key) is not None)
+        token = _pinned_to_primary.set(pinned)
+        # The lag probe queries the replica, which cannot run on the event loop
+        replica = None if pinned or not replica_aliases() else await sync_to_async(choose_replica)()
+        replica_token = _request_replica.set(replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_replica.reset(replica_token)
+            _pinned_to_primary.reset(token)
+        if is_write and key is not None and response.status_code < 400:
+            await cache.aset(key, True, settings.DATABASE_STICKY_SECONDS)
+        return response
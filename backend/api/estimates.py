@@ -0,0 +1,48 @@
+"""
+Approximate row counts for large tables
+
+COUNT(*) over an unbounded table is a full scan. On PostgreSQL the
+planner's row estimate is used instead once it passes a threshold; on
+other databases counting stops at the threshold.
+"""
+import json
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimate_count(queryset, threshold=EXACT_COUNT_THRESHOLD):
+    """
+    Return (count, is_estimate). Counts at or below `threshold` are exact.
+    Above it the count is the planner estimate on PostgreSQL, or
+    threshold + 1 meaning "more than threshold" elsewhere.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate > threshold:
+            return estimate, True
+        return queryset.count(), False
+    
+    count = queryset[:threshold + 1].count()
+    return count, count > threshold
+
+
+class EstimatedCountPaginator(Paginator):
+    """Django paginator that uses estimate_count() instead of COUNT(*)"""
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return estimate_count(self.object_list)[0]
+        return super().count
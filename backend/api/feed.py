@@ -0,0 +1,93 @@
+"""
+Group market feed
+
+New GroupMarket rows are fanned out on write to one GroupFeedEntry per
+member, so reading a feed is a range scan on (user, created_at). Groups
+larger than FEED_FANOUT_MAX_MEMBERS are not fanned out; their markets are
+read directly from GroupMarket and merged in (fan-out on read).
+
+Removing a member deletes their entries for that group, and reads only
+return entries from groups the user still belongs to.
+"""
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from .membership import get_user_group_ids
+from .models import Group, GroupMarket, GroupFeedEntry
+
+FEED_FANOUT_MAX_MEMBERS = 5000
+FEED_FANOUT_BATCH_SIZE = 1000
+
+
+def fan_out_group_market(group_market):
+    """Copy a newly added group market into its members' feeds"""
+    group = group_market.group
+    if group.member_count > FEED_FANOUT_MAX_MEMBERS:
+        return
+    
+    user_ids = group.members.values_list('id', flat=True).iterator(chunk_size=FEED_FANOUT_BATCH_SIZE)
+    batch = [GroupFeedEntry(user_id=group.owner_id, group_market=group_market, created_at=group_market.created_at)]
+    for user_id in user_ids:
+        batch.append(GroupFeedEntry(user_id=user_id, group_market=group_market, created_at=group_market.created_at))
+        if len(batch) >= FEED_FANOUT_BATCH_SIZE:
+            GroupFeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        GroupFeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def get_feed_page(user, limit, before=None, before_id=None):
+    """
+    Return up to `limit` GroupMarkets for the user's feed, newest first.
+    `before`/`before_id` is the (created_at, id) keyset of the last item seen.
+    """
+    group_ids = get_user_group_ids(user)
+    current_group_ids = group_ids['member'] | group_ids['owned']
+    if not current_group_ids:
+        return []
+    large_group_ids = list(
+        Group.objects.filter(
+            pk__in=current_group_ids,
+            member_count__gt=FEED_FANOUT_MAX_MEMBERS,
+        ).values_list('pk', flat=True)
+    )
+    
+    entries = GroupFeedEntry.objects.filter(user=user, group_market__group_id__in=current_group_ids)
+    if before is not None:
+        entries = entries.filter(
+            Q(created_at__lt=before) | Q(created_at=before, group_market_id__lt=before_id)
+        )
+    entries = entries.select_related(
+        'group_market__group', 'group_market__market'
+    ).order_by('-created_at', '-group_market_id')[:limit]
+    group_markets = [entry.group_market for entry in entries]
+    
+    if large_group_ids:
+        direct = GroupMarket.objects.filter(group_id__in=large_group_ids)
+        if before is not None:
+            direct = direct.filter(
+                Q(created_at__lt=before) | Q(created_at=before, id__lt=before_id)
+            )
+        group_markets.extend(
+            direct.select_related('group', 'market').order_by('-created_at', '-id')[:limit]
+        )
+    
+    # A group that grew past the threshold can appear in both sources
+    unique = {group_market.id: group_market for group_market in group_markets}
+    return sorted(unique.values(), key=lambda gm: (gm.created_at, gm.id), reverse=True)[:limit]
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def remove_feed_entries_on_leave(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop removed members' feed entries for the group; owners keep theirs"""
+    if action not in ('post_remove', 'pre_clear'):
+        return
+    if reverse:
+        entries = GroupFeedEntry.objects.filter(user_id=instance.pk)
+        if pk_set is not None:
+            entries = entries.filter(group_market__group_id__in=pk_set)
+    else:
+        entries = GroupFeedEntry.objects.filter(group_market__group_id=instance.pk)
+        if pk_set is not None:
+            entries = entries.filter(user_id__in=pk_set)
+    entries.exclude(group_market__group__owner_id=F('user_id')).delete()
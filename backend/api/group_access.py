@@ -0,0 +1,89 @@
+"""
+Set-based handling of group access requests
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .membership import invalidate_user_group_ids
+from .models import Group, GroupAccessRequest, AuditLog
+
+BULK_BATCH_SIZE = 1000
+
+
+def bulk_respond_access_requests(access_requests, new_status, responded_by):
+    """
+    Approve or deny the pending requests in `access_requests` with one UPDATE,
+    one bulk insert into the members table (approvals only) and one bulk
+    AuditLog insert. The pending rows are locked first, so overlapping calls
+    handle each request once. Returns the number of requests handled.
+    """
+    now = timezone.now()
+    verb = 'Approved' if new_status == 'APPROVED' else 'Denied'
+    with transaction.atomic():
+        # Lock the pending rows so a concurrent call cannot handle them too
+        rows = list(
+            GroupAccessRequest.objects.select_for_update(of=('self',))
+            .filter(pk__in=access_requests.filter(status='PENDING').values('pk'), status='PENDING')
+            .order_by('pk')
+            .values_list('id', 'group_id', 'user_id', 'user__username', 'group__name')
+        )
+        if not rows:
+            return 0
+        updated = GroupAccessRequest.objects.filter(id__in=[row[0] for row in rows], status='PENDING').update(
+            status=new_status, responded_at=now, responded_by=responded_by
+        )
+        if updated != len(rows):
+            # Databases without row locks: keep only the rows this UPDATE changed
+            changed = set(
+                GroupAccessRequest.objects.filter(
+                    id__in=[row[0] for row in rows], status=new_status, responded_at=now, responded_by=responded_by
+                ).values_list('id', flat=True)
+            )
+            rows = [row for row in rows if row[0] in changed]
+        if new_status == 'APPROVED':
+            _bulk_add_members(rows, now)
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=responded_by,
+                action='APPROVE_ACCESS' if new_status == 'APPROVED' else 'DENY_ACCESS',
+                target_object=f"User: {username}, Group: {group_name}",
+                details=f"{verb} access request from {username} for group {group_name}"
+            )
+            for _, _, _, username, group_name in rows
+        ], batch_size=BULK_BATCH_SIZE)
+    return len(rows)
+
+
+def _bulk_add_members(rows, now):
+    """
+    Insert memberships directly into the through-table. bulk_create skips
+    m2m_changed, so member_count and the membership cache are updated here.
+    """
+    Membership = Group.members.through
+    user_ids_by_group = defaultdict(set)
+    for _, group_id, user_id, _, _ in rows:
+        user_ids_by_group[group_id].add(user_id)
+    
+    # Group rows are locked in a fixed order so member_count stays exact
+    # when approvals for the same group run concurrently
+    list(Group.objects.select_for_update().filter(pk__in=user_ids_by_group).order_by('pk').values_list('pk'))
+    
+    added_user_ids = set()
+    for group_id, user_ids in user_ids_by_group.items():
+        existing = set(
+            Membership.objects.filter(group_id=group_id, user_id__in=user_ids).values_list('user_id', flat=True)
+        )
+        new_user_ids = user_ids - existing
+        if not new_user_ids:
+            continue
+        Membership.objects.bulk_create(
+            [Membership(group_id=group_id, user_id=user_id) for user_id in new_user_ids],
+            batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+        )
+        Group.objects.filter(pk=group_id).update(
+            member_count=F('member_count') + len(new_user_ids), last_activity_at=now
+        )
+        added_user_ids |= new_user_ids
+    
+    transaction.on_commit(lambda: invalidate_user_group_ids(added_user_ids))
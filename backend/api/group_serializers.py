@@ -1,6 +1,11 @@
 from rest_framework import serializers
 from .models import Group, GroupAccessRequest, GroupMarket, Market
 from django.contrib.auth.models import User
+from .membership import is_group_admin, is_group_member
+from .pagination import (
+    GroupUserCursorPagination, GroupMarketCursorPagination,
+    GroupAccessRequestCursorPagination
+)
 
 
 class UserBasicSerializer(serializers.ModelSerializer):
@@ -35,7 +40,47 @@ class GroupMarketSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class GroupListSerializer(serializers.ModelSerializer):
+class GroupFeedItemSerializer(GroupMarketSerializer):
+    """A group market as it appears in a member's feed"""
+    group_name = serializers.CharField(source='group.name', read_only=True)
+    
+    class Meta(GroupMarketSerializer.Meta):
+        fields = ['id', 'group', 'group_name', 'market', 'market_title', 'market_status', 'created_at']
+
+
+class GroupMembershipFlagsMixin:
+    """
+    Resolve is_member/is_owner/is_admin for the requesting user.
+    Uses the flags annotated by GroupViewSet.get_queryset when present and
+    falls back to the per-user membership cache for unannotated instances.
+    """
+    
+    def _request_user(self):
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return None
+        return request.user
+    
+    def get_is_member(self, obj):
+        if hasattr(obj, 'is_member'):
+            return obj.is_member
+        return is_group_member(self._request_user(), obj)
+    
+    def get_is_owner(self, obj):
+        if hasattr(obj, 'is_owner'):
+            return obj.is_owner
+        user = self._request_user()
+        if user is None:
+            return False
+        return obj.owner_id == user.pk
+    
+    def get_is_admin(self, obj):
+        if hasattr(obj, 'is_admin'):
+            return obj.is_admin
+        return is_group_admin(self._request_user(), obj)
+
+
+class GroupListSerializer(GroupMembershipFlagsMixin, serializers.ModelSerializer):
     """Simplified group serializer for list views"""
     owner_name = serializers.CharField(source='owner.username', read_only=True)
     is_member = serializers.SerializerMethodField()
@@ -46,37 +91,29 @@ class GroupListSerializer(serializers.ModelSerializer):
         model = Group
         fields = [
             'id', 'name', 'description', 'category', 'privacy',
-            'owner', 'owner_name', 'created_at', 'updated_at',
+            'owner', 'owner_name', 'member_count', 'created_at', 'updated_at',
             'is_member', 'is_owner', 'is_admin'
         ]
-    
-    def get_is_member(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return request.user in obj.members.all() or request.user == obj.owner
-    
-    def get_is_owner(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return request.user == obj.owner
-    
-    def get_is_admin(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return request.user in obj.admins.all() or request.user == obj.owner
+        read_only_fields = ['member_count']
+        # Columns behind the membership flags for ?fields= (api.sparse)
+        sparse_sources = {'is_member': ('owner',), 'is_owner': ('owner',), 'is_admin': ('owner',)}
 
 
-class GroupDetailSerializer(serializers.ModelSerializer):
-    """Full group serializer with members and markets"""
+class GroupDetailSerializer(GroupMembershipFlagsMixin, serializers.ModelSerializer):
+    """
+    Full group serializer with member, admin, market and access request counts.
+    Only the first page of each collection is nested; the rest is served by the
+    paginated /members/, /admins/, /markets/ and /access_requests/ endpoints.
+    Access requests, like that endpoint, are shown to group admins only.
+    """
     owner_info = UserBasicSerializer(source='owner', read_only=True)
-    members_info = UserBasicSerializer(source='members', many=True, read_only=True)
-    admins_info = UserBasicSerializer(source='admins', many=True, read_only=True)
-    markets = GroupMarketSerializer(source='group_markets', many=True, read_only=True)
-    access_requests = GroupAccessRequestSerializer(many=True, read_only=True)
-    member_count = serializers.SerializerMethodField()
+    members_info = serializers.SerializerMethodField()
+    admins_info = serializers.SerializerMethodField()
+    markets = serializers.SerializerMethodField()
+    access_requests = serializers.SerializerMethodField()
+    admin_count = serializers.SerializerMethodField()
+    market_count = serializers.SerializerMethodField()
+    access_request_count = serializers.SerializerMethodField()
     is_member = serializers.SerializerMethodField()
     is_owner = serializers.SerializerMethodField()
     is_admin = serializers.SerializerMethodField()
@@ -86,29 +123,42 @@ class GroupDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'category', 'privacy',
             'owner', 'owner_info', 'members_info', 'admins_info',
-            'member_count', 'markets', 'access_requests',
+            'member_count', 'admin_count', 'market_count', 'access_request_count',
+            'markets', 'access_requests',
             'created_at', 'updated_at',
             'is_member', 'is_owner', 'is_admin'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'access_requests']
+        read_only_fields = ['created_at', 'updated_at', 'member_count', 'access_requests']
     
-    def get_member_count(self, obj):
-        return obj.member_count()
+    def get_members_info(self, obj):
+        members = obj.members.order_by('id')[:GroupUserCursorPagination.page_size]
+        return UserBasicSerializer(members, many=True).data
     
-    def get_is_member(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return request.user in obj.members.all() or request.user == obj.owner
+    def get_admins_info(self, obj):
+        admins = obj.admins.order_by('id')[:GroupUserCursorPagination.page_size]
+        return UserBasicSerializer(admins, many=True).data
     
-    def get_is_owner(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return request.user == obj.owner
+    def get_markets(self, obj):
+        group_markets = obj.group_markets.select_related('market').order_by(
+            '-created_at', '-id'
+        )[:GroupMarketCursorPagination.page_size]
+        return GroupMarketSerializer(group_markets, many=True).data
     
-    def get_is_admin(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return request.user in obj.admins.all() or request.user == obj.owner
+    def get_access_requests(self, obj):
+        if not self.get_is_admin(obj):
+            return []
+        access_requests = obj.access_requests.select_related('user', 'group').order_by(
+            '-requested_at', '-id'
+        )[:GroupAccessRequestCursorPagination.page_size]
+        return GroupAccessRequestSerializer(access_requests, many=True).data
+    
+    def get_admin_count(self, obj):
+        return obj.admins.count()
+    
+    def get_market_count(self, obj):
+        return obj.group_markets.count()
+    
+    def get_access_request_count(self, obj):
+        if not self.get_is_admin(obj):
+            return None
+        return obj.access_requests.count()
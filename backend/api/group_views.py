@@ -1,43 +1,90 @@
 """
 Group management viewsets and endpoints
 """
+import hashlib
+from urllib.parse import urlencode
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q, Value
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import Group, GroupAccessRequest, GroupMarket, Market, AuditLog
+from django.utils.dateparse import parse_datetime
+from .models import Group, GroupAccessRequest, GroupMarket, AuditLog
+from .audit import log_action
+from .caching import TieredCache
+from .group_access import bulk_respond_access_requests
+from .feed import fan_out_group_market, get_feed_page
+from .lookups import get_market
+from .membership import get_user_group_ids, is_group_admin, is_group_member
+from .sparse import SparseFieldsMixin
+from .pagination import (
+    GroupCursorPagination, GroupDiscoverCursorPagination, GroupFeedPagination, GroupUserCursorPagination,
+    GroupMarketCursorPagination, GroupAccessRequestCursorPagination
+)
 from .group_serializers import (
-    GroupListSerializer, GroupDetailSerializer, 
-    GroupAccessRequestSerializer, GroupMarketSerializer
+    GroupListSerializer, GroupDetailSerializer, UserBasicSerializer,
+    GroupAccessRequestSerializer, GroupMarketSerializer, GroupFeedItemSerializer
 )
 
+# Seconds the first page of each discovery query is served from cache
+DISCOVER_CACHE_TIMEOUT = 60
+
+discover_cache = TieredCache('discover', DISCOVER_CACHE_TIMEOUT)
 
-class GroupViewSet(viewsets.ModelViewSet):
+
+class GroupViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """Viewset for managing groups and discovering public/private groups"""
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = GroupCursorPagination
     
     def get_queryset(self):
-        """Return groups user has access to"""
+        """Return groups user has access to, annotated with the user's membership flags"""
         user = self.request.user
+        queryset = Group.objects.select_related('owner')
         if not user.is_authenticated:
             # Unauthenticated users see only public groups
-            return Group.objects.filter(privacy='PUBLIC')
+            return queryset.filter(privacy='PUBLIC').annotate(
+                is_member=Value(False), is_admin=Value(False), is_owner=Value(False)
+            )
         
-        # Authenticated users see: owned groups, member groups, and public groups
-        return Group.objects.filter(
-            privacy='PUBLIC'
-        ) | Group.objects.filter(owner=user) | Group.objects.filter(members=user)
+        # Flags are computed with EXISTS subqueries so a page of groups costs a
+        # constant number of queries regardless of group size.
+        is_owner = Q(owner=user)
+        queryset = queryset.annotate(
+            is_owner=ExpressionWrapper(is_owner, output_field=BooleanField()),
+            is_member=ExpressionWrapper(
+                is_owner | Q(Exists(Group.members.through.objects.filter(group_id=OuterRef('pk'), user_id=user.pk))),
+                output_field=BooleanField(),
+            ),
+            is_admin=ExpressionWrapper(
+                is_owner | Q(Exists(Group.admins.through.objects.filter(group_id=OuterRef('pk'), user_id=user.pk))),
+                output_field=BooleanField(),
+            ),
+        )
+        
+        # Authenticated users see: owned groups, member groups, and public groups.
+        # Membership is tested with EXISTS so the members join cannot duplicate rows.
+        return queryset.filter(Q(privacy='PUBLIC') | Q(is_member=True))
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return GroupDetailSerializer
         return GroupListSerializer
     
+    def _paginated_response(self, queryset, serializer_class, pagination_class):
+        """Serialize one cursor page of a group sub-resource"""
+        paginator = pagination_class()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True, context={'request': self.request})
+        return paginator.get_paginated_response(serializer.data)
+    
     def perform_create(self, serializer):
         """Create group with current user as owner"""
         group = serializer.save(owner=self.request.user)
-        AuditLog.objects.create(
+        log_action(
             user=self.request.user,
             action='CREATE_GROUP' if hasattr(AuditLog, 'ACTION_CHOICES') else 'OTHER',
             target_object=f"Group: {group.name}",
@@ -51,7 +98,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check if user is already a member
-        if user in group.members.all() or user == group.owner:
+        if is_group_member(user, group):
             return Response(
                 {'error': 'You are already a member of this group.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -74,7 +121,7 @@ class GroupViewSet(viewsets.ModelViewSet):
             )
         
         # Log the access request
-        AuditLog.objects.create(
+        log_action(
             user=user,
             action='REQUEST_ACCESS',
             target_object=f"Group: {group.name}",
@@ -91,7 +138,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check permission
-        if user != group.owner and user not in group.admins.all():
+        if not is_group_admin(user, group):
             return Response(
                 {'error': 'Only group owner or admins can approve access.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -116,7 +163,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         group.members.add(access_request.user)
         
         # Log approval
-        AuditLog.objects.create(
+        log_action(
             user=user,
             action='APPROVE_ACCESS',
             target_object=f"User: {access_request.user.username}, Group: {group.name}",
@@ -133,7 +180,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check permission
-        if user != group.owner and user not in group.admins.all():
+        if not is_group_admin(user, group):
             return Response(
                 {'error': 'Only group owner or admins can deny access.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -155,7 +202,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         access_request.save()
         
         # Log denial
-        AuditLog.objects.create(
+        log_action(
             user=user,
             action='DENY_ACCESS',
             target_object=f"User: {access_request.user.username}, Group: {group.name}",
@@ -165,6 +212,48 @@ class GroupViewSet(viewsets.ModelViewSet):
         serializer = GroupAccessRequestSerializer(access_request)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk_approve_access(self, request, pk=None):
+        """Approve many access requests at once (admin/owner only)"""
+        return self._bulk_respond(request, 'APPROVED')
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk_deny_access(self, request, pk=None):
+        """Deny many access requests at once (admin/owner only)"""
+        return self._bulk_respond(request, 'DENIED')
+    
+    def _bulk_respond(self, request, new_status):
+        """
+        Respond to the pending requests listed in `request_ids`, or to every
+        pending request of the group when `all_pending` is true.
+        """
+        group = self.get_object()
+        user = request.user
+        verb = 'approve' if new_status == 'APPROVED' else 'deny'
+        
+        # Check permission
+        if not is_group_admin(user, group):
+            return Response(
+                {'error': f'Only group owner or admins can {verb} access.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        access_requests = group.access_requests.all()
+        if not request.data.get('all_pending'):
+            request_ids = request.data.get('request_ids')
+            if not isinstance(request_ids, list) or not all(str(rid).isdigit() for rid in request_ids):
+                return Response(
+                    {'error': 'request_ids must be a list of request IDs, or set all_pending.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            access_requests = access_requests.filter(id__in=request_ids)
+        
+        count = bulk_respond_access_requests(access_requests, new_status, user)
+        return Response(
+            {'status': f'{new_status.capitalize()} {count} access request(s)', 'count': count},
+            status=status.HTTP_200_OK
+        )
+    
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def access_requests(self, request, pk=None):
         """List pending access requests for a group (admin/owner only)"""
@@ -172,15 +261,40 @@ class GroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check permission
-        if user != group.owner and user not in group.admins.all():
+        if not is_group_admin(user, group):
             return Response(
                 {'error': 'Only group owner or admins can view access requests.'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        access_requests = group.access_requests.filter(status='PENDING')
-        serializer = GroupAccessRequestSerializer(access_requests, many=True)
-        return Response(serializer.data)
+        access_requests = group.access_requests.filter(status='PENDING').select_related('user', 'group')
+        return self._paginated_response(
+            access_requests, GroupAccessRequestSerializer, GroupAccessRequestCursorPagination
+        )
+    
+    @action(detail=True, methods=['get'])
+    def members(self, request, pk=None):
+        """List group members, one cursor page at a time"""
+        group = self.get_object()
+        return self._paginated_response(
+            group.members.all(), UserBasicSerializer, GroupUserCursorPagination
+        )
+    
+    @action(detail=True, methods=['get'])
+    def admins(self, request, pk=None):
+        """List group admins, one cursor page at a time"""
+        group = self.get_object()
+        return self._paginated_response(
+            group.admins.all(), UserBasicSerializer, GroupUserCursorPagination
+        )
+    
+    @action(detail=True, methods=['get'])
+    def markets(self, request, pk=None):
+        """List markets attached to the group, one cursor page at a time"""
+        group = self.get_object()
+        return self._paginated_response(
+            group.group_markets.select_related('market'), GroupMarketSerializer, GroupMarketCursorPagination
+        )
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def add_market(self, request, pk=None):
@@ -189,16 +303,15 @@ class GroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check permission
-        if user != group.owner and user not in group.admins.all():
+        if not is_group_admin(user, group):
             return Response(
                 {'error': 'Only group owner or admins can add markets.'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
         market_id = request.data.get('market_id')
-        try:
-            market = Market.objects.get(id=market_id)
-        except Market.DoesNotExist:
+        market = get_market(market_id)
+        if market is None:
             return Response(
                 {'error': 'Market not found.'},
                 status=status.HTTP_404_NOT_FOUND
@@ -216,8 +329,11 @@ class GroupViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Push the market into members' feeds
+        fan_out_group_market(group_market)
+        
         # Log the action
-        AuditLog.objects.create(
+        log_action(
             user=user,
             action='ADD_GROUP_MARKET',
             target_object=f"Market: {market.title}, Group: {group.name}",
@@ -234,7 +350,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check permission
-        if user != group.owner and user not in group.admins.all():
+        if not is_group_admin(user, group):
             return Response(
                 {'error': 'Only group owner or admins can remove markets.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -247,7 +363,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         group_market.delete()
         
         # Log the action
-        AuditLog.objects.create(
+        log_action(
             user=user,
             action='REMOVE_GROUP_MARKET',
             target_object=f"Market: {market.title}, Group: {group.name}",
@@ -259,9 +375,100 @@ class GroupViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
-    def discover(self, request, pk=None):
-        """Get all discoverable groups (public + ones user can request access to)"""
-        groups = Group.objects.all()
-        serializer = self.get_serializer(groups, many=True, context={'request': request})
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def discover(self, request):
+        """
+        Get discoverable groups (public + ones user can request access to).
+        Supports ?category=, ?privacy=, ?search= (name prefix), ?min_members=
+        and ?ordering=members|active|newest. The first page of each filter
+        combination is cached; the caller's membership flags are applied on top.
+        """
+        params = request.query_params
+        groups = Group.objects.select_related('owner')
+        
+        if params.get('category'):
+            groups = groups.filter(category=params['category'])
+        if params.get('privacy'):
+            groups = groups.filter(privacy=params['privacy'])
+        search = params.get('search', '').strip().lower()
+        if search:
+            groups = groups.filter(search_name__startswith=search)
+        if params.get('min_members'):
+            try:
+                groups = groups.filter(member_count__gte=int(params['min_members']))
+            except ValueError:
+                return Response(
+                    {'error': 'min_members must be an integer.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        paginator = GroupDiscoverCursorPagination()
+        first_page = paginator.cursor_query_param not in params
+        cache_key = hashlib.md5(
+            urlencode(sorted(params.lists()), doseq=True).encode()
+        ).hexdigest()
+        
+        def load_page():
+            page = paginator.paginate_queryset(groups, request, view=self)
+            # No request in context: flags are resolved below, not per row
+            serializer = GroupListSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+        
+        data = discover_cache.get_or_set(cache_key, load_page) if first_page else load_page()
+        
+        return Response(self._with_membership_flags(data, request.user))
+    
+    def _with_membership_flags(self, data, user):
+        """Apply the user's is_member/is_admin/is_owner flags to a page of groups"""
+        group_ids = get_user_group_ids(user)
+        results = []
+        for group in data['results']:
+            is_owner = group['owner'] == user.pk
+            results.append({
+                **group,
+                'is_member': is_owner or group['id'] in group_ids['member'],
+                'is_owner': is_owner,
+                'is_admin': is_owner or group['id'] in group_ids['admin'],
+            })
+        return {**data, 'results': results}
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def mine(self, request):
+        """List groups the user owns, administers or belongs to"""
+        group_ids = get_user_group_ids(request.user)
+        groups = self.get_queryset().filter(
+            pk__in=group_ids['member'] | group_ids['admin'] | group_ids['owned']
+        )
+        page = self.paginate_queryset(groups)
+        serializer = GroupListSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        """
+        Markets recently added to the user's groups, newest first.
+        Page with the ?before=&before_id= values returned in `next`.
+        """
+        paginator = GroupFeedPagination()
+        page_size = paginator.get_page_size(request)
+        before = request.query_params.get('before')
+        before_id = request.query_params.get('before_id')
+        if before is not None:
+            before = parse_datetime(before)
+            if before is None or not (before_id or '').isdigit():
+                return Response(
+                    {'error': 'before must be an ISO timestamp and before_id an integer.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        group_markets = get_feed_page(request.user, page_size, before, before_id)
+        serializer = GroupFeedItemSerializer(group_markets, many=True)
+        
+        next_url = None
+        if len(group_markets) == page_size:
+            last = group_markets[-1]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'before', last.created_at.isoformat()
+            )
+            next_url = replace_query_param(next_url, 'before_id', last.id)
+        return Response({'next': next_url, 'results': serializer.data})
@@ -0,0 +1,256 @@
+"""
+Cross-worker cache invalidation bus
+
+api.caching invalidates the shared tier directly, but local LRU entries
+are dropped only in the process that made the change. This bus carries
+those invalidations (tags and keys) to every other worker, so model
+changes reach all processes. The changes come from the post_save /
+post_delete / m2m_changed receivers for Market, Outcome, Profile and
+Group in api.lookups and api.membership.
+
+Transports:
+- Postgres LISTEN/NOTIFY on the default database when it is Postgres
+- otherwise Unix datagram sockets in INVALIDATION_BUS_SOCKET_DIR, one per
+  process (workers on the same host)
+
+Invalidations are coalesced for INVALIDATION_BUS_FLUSH_INTERVAL seconds
+and sent as one message, split to stay under NOTIFY's payload limit.
+Receivers record the latency from the first coalesced invalidation to
+its application.
+"""
+import glob
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'kastia_invalidate'
+# NOTIFY payloads must stay below 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+
+def _dumps(value):
+    # Compact separators, so each list item costs its own length plus one comma
+    return json.dumps(value, separators=(',', ':'))
+
+
+def encode_messages(origin, sent_at, tags, keys):
+    """Split tags and keys into JSON payloads under MAX_PAYLOAD_BYTES"""
+    messages = []
+    current = {'o': origin, 't': sent_at, 'tags': [], 'keys': []}
+    size = len(_dumps(current))
+    for field, values in (('tags', tags), ('keys', keys)):
+        for value in values:
+            item_size = len(_dumps(value)) + 1
+            if size + item_size > MAX_PAYLOAD_BYTES and (current['tags'] or current['keys']):
+                messages.append(_dumps(current))
+                current = {'o': origin, 't': sent_at, 'tags': [], 'keys': []}
+                size = len(_dumps(current))
+            current[field].append(value)
+            size += item_size
+    if current['tags'] or current['keys']:
+        messages.append(_dumps(current))
+    return messages
+
+
+class PostgresTransport:
+    """NOTIFY on publish, LISTEN on a dedicated autocommit connection"""
+    name = 'postgres'
+
+    def __init__(self):
+        self._send_conn = None
+
+    def _connect(self):
+        import psycopg
+        params = connections[DEFAULT_DB_ALIAS].get_connection_params()
+        return psycopg.connect(**params, autocommit=True)
+
+    def send(self, payloads):
+        if self._send_conn is None or self._send_conn.closed:
+            self._send_conn = self._connect()
+        for payload in payloads:
+            self._send_conn.execute('SELECT pg_notify(%s, %s)', (CHANNEL, payload))
+
+    def listen(self, handle, stopping):
+        conn = self._connect()
+        try:
+            conn.execute(f'LISTEN {CHANNEL}')
+            while not stopping.is_set():
+                for notify in conn.notifies(timeout=1.0):
+                    handle(notify.payload)
+        finally:
+            conn.close()
+
+
+class SocketTransport:
+    """Datagrams to every process socket in a shared directory"""
+    name = 'socket'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = None
+        self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def send(self, payloads):
+        for peer in glob.glob(os.path.join(self.directory, '*.sock')):
+            if peer == self.path:
+                continue
+            try:
+                for payload in payloads:
+                    self._send_sock.sendto(payload.encode(), peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The process behind this socket has exited
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.warning('Invalidation bus peer %s is not keeping up', peer)
+
+    def listen(self, handle, stopping):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.path)
+        sock.settimeout(1.0)
+        try:
+            while not stopping.is_set():
+                try:
+                    payload = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                handle(payload.decode())
+        finally:
+            sock.close()
+            os.unlink(self.path)
+
+
+class InvalidationBus:
+    """Coalesces local invalidations, broadcasts them and applies remote ones"""
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.transport = None
+        self._origin = None
+        self._pending_tags = set()
+        self._pending_keys = set()
+        self._first_pending_at = None
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._pid = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'published': 0, 'messages_sent': 0, 'messages_received': 0,
+            'latency_ms_last': None, 'latency_ms_max': 0.0, 'latency_ms_total': 0.0,
+        }
+
+    def _make_transport(self):
+        backend = settings.INVALIDATION_BUS_BACKEND
+        if backend == 'auto':
+            backend = 'postgres' if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql' else 'socket'
+        if backend == 'postgres':
+            return PostgresTransport()
+        return SocketTransport(settings.INVALIDATION_BUS_SOCKET_DIR)
+
+    def ensure_started(self):
+        # Gunicorn forks workers after import, so each process needs its own threads
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._origin = uuid.uuid4().hex
+            self._pending_tags, self._pending_keys = set(), set()
+            self._first_pending_at = None
+            self._stopping = threading.Event()
+            self.transport = self._make_transport()
+            threading.Thread(target=self._run_listener, name='invalidation-listener', daemon=True).start()
+            threading.Thread(target=self._run_sender, name='invalidation-sender', daemon=True).start()
+
+    def publish(self, tags=(), keys=()):
+        self.ensure_started()
+        with self._cond:
+            self._pending_tags.update(tags)
+            self._pending_keys.update(keys)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.time()
+            self._cond.notify()
+        with self._stats_lock:
+            self._stats['published'] += 1
+
+    def _run_sender(self):
+        stopping = self._stopping
+        while not stopping.is_set():
+            with self._cond:
+                self._cond.wait_for(lambda: self._first_pending_at is not None or stopping.is_set())
+                first_pending_at = self._first_pending_at
+            # Let a burst of invalidations collect into one message
+            delay = first_pending_at + self.flush_interval - time.time() if first_pending_at else 0
+            if delay > 0:
+                time.sleep(delay)
+            with self._cond:
+                tags, self._pending_tags = self._pending_tags, set()
+                keys, self._pending_keys = self._pending_keys, set()
+                sent_at, self._first_pending_at = self._first_pending_at, None
+            if not (tags or keys):
+                continue
+            payloads = encode_messages(self._origin, sent_at, sorted(tags), sorted(keys))
+            try:
+                self.transport.send(payloads)
+            except Exception:
+                logger.exception('Invalidation bus send failed; peers fall back to local TTLs')
+                continue
+            with self._stats_lock:
+                self._stats['messages_sent'] += len(payloads)
+
+    def _run_listener(self):
+        stopping = self._stopping
+        while not stopping.is_set():
+            try:
+                self.transport.listen(self._handle, stopping)
+            except Exception:
+                logger.exception('Invalidation bus listener failed, reconnecting')
+                stopping.wait(1.0)
+
+    def _handle(self, payload):
+        message = json.loads(payload)
+        if message['o'] == self._origin:
+            return
+        caching.local_cache.delete_tagged(message['tags'])
+        for key in message['keys']:
+            caching.local_cache.delete(key)
+        latency_ms = (time.time() - message['t']) * 1000
+        with self._stats_lock:
+            self._stats['messages_received'] += 1
+            self._stats['latency_ms_last'] = round(latency_ms, 2)
+            self._stats['latency_ms_max'] = round(max(self._stats['latency_ms_max'], latency_ms), 2)
+            self._stats['latency_ms_total'] += latency_ms
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = stats.pop('latency_ms_total')
+        stats['latency_ms_avg'] = round(total / stats['messages_received'], 2) if stats['messages_received'] else None
+        stats['transport'] = self.transport.name if self.transport else None
+        return stats
+
+
+invalidation_bus = InvalidationBus(settings.INVALIDATION_BUS_FLUSH_INTERVAL)
+
+
+def bus_stats():
+    """Publish/receive counters and invalidation latency for this process"""
+    return invalidation_bus.stats()
+
+
+if settings.INVALIDATION_BUS_BACKEND != 'off':
+    caching.bus = invalidation_bus
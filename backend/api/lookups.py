@@ -0,0 +1,76 @@
+"""
+Cached lookups for hot reads
+
+Markets (with outcomes) by ID and profiles by user ID go through the
+two-tier cache in api.caching. get_markets() resolves a list of market IDs
+from the same cache entries, loading the misses with one query. Saves and
+deletes invalidate the matching tags once they commit; bulk profile updates
+invalidate the 'profiles' tag.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .caching import cached, invalidate_tags
+from .models import Market, Outcome, Profile
+
+MARKET_CACHE_TIMEOUT = 60
+PROFILE_CACHE_TIMEOUT = 300
+PROFILES_TAG = 'profiles'
+
+
+def market_tag(market_id):
+    return f'market:{market_id}'
+
+
+def profile_tag(user_id):
+    return f'profile:{user_id}'
+
+
+@cached('markets', ttl=MARKET_CACHE_TIMEOUT, tags=lambda market_id: [market_tag(market_id)])
+def get_market(market_id):
+    """Market with its outcomes prefetched, or None"""
+    return Market.objects.prefetch_related('outcomes').filter(pk=market_id).first()
+
+
+def get_markets(market_ids):
+    """{market_id: Market} for the IDs that exist, outcomes prefetched"""
+    market_ids = list(dict.fromkeys(int(market_id) for market_id in market_ids))
+    found = get_market.cache.get_many_or_load(
+        market_ids, _load_markets, tags=lambda market_id: [market_tag(market_id)]
+    )
+    return {market_id: found[market_id] for market_id in market_ids if found[market_id] is not None}
+
+
+def _load_markets(market_ids):
+    loaded = {market.pk: market for market in Market.objects.prefetch_related('outcomes').filter(pk__in=market_ids)}
+    # Unknown IDs are cached as None, as get_market does
+    return {market_id: loaded.get(market_id) for market_id in market_ids}
+
+
+@cached('profiles', ttl=PROFILE_CACHE_TIMEOUT, tags=lambda user_id: [PROFILES_TAG, profile_tag(user_id)])
+def get_profile(user_id):
+    """The user's Profile, or None"""
+    return Profile.objects.filter(user_id=user_id).first()
+
+
+def _invalidate_on_commit(tag, using):
+    # Invalidating before commit lets a concurrent miss reload the old row
+    transaction.on_commit(lambda: invalidate_tags(tag), using=using)
+
+
+@receiver(post_save, sender=Market)
+@receiver(post_delete, sender=Market)
+def invalidate_market(sender, instance, using, **kwargs):
+    _invalidate_on_commit(market_tag(instance.pk), using)
+
+
+@receiver(post_save, sender=Outcome)
+@receiver(post_delete, sender=Outcome)
+def invalidate_market_outcome(sender, instance, using, **kwargs):
+    _invalidate_on_commit(market_tag(instance.market_id), using)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile(sender, instance, using, **kwargs):
+    _invalidate_on_commit(profile_tag(instance.user_id), using)
@@ -0,0 +1,54 @@
+"""
+Management command to maintain AuditLog partitions and enforce retention
+Usage: python manage.py audit_log_retention [--retain-months N] [--months-ahead N]
+Run it daily (e.g. from a cron job).
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.audit_partitions import (
+    add_months, archive_month, default_months, drop_month, ensure_partition,
+    is_partitioned, month_start, stored_months,
+)
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming AuditLog partitions and archive expired months'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retain-months', type=int, default=settings.AUDIT_LOG_RETENTION_MONTHS,
+            help='Number of whole months to keep, including the current one'
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Partitions to create ahead of the current month (PostgreSQL)'
+        )
+        parser.add_argument(
+            '--archive-dir', default=settings.AUDIT_LOG_ARCHIVE_DIR,
+            help='Directory for compressed monthly archives'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+
+        if is_partitioned() and not options['dry_run']:
+            # Rows that fell into the DEFAULT partition move to their month's partition
+            for month in default_months():
+                ensure_partition(month)
+                self.stdout.write(f'Moved {month:%Y-%m} out of the default partition')
+            for offset in range(options['months_ahead'] + 1):
+                ensure_partition(add_months(current, offset))
+            self.stdout.write(self.style.SUCCESS(
+                f"Partitions ensured through {add_months(current, options['months_ahead']):%Y-%m}"
+            ))
+
+        cutoff = add_months(current, 1 - max(options['retain_months'], 1))
+        for month in stored_months(cutoff):
+            if options['dry_run']:
+                self.stdout.write(f'Would archive {month:%Y-%m}')
+                continue
+            path, rows = archive_month(month, options['archive_dir'])
+            drop_month(month)
+            self.stdout.write(self.style.SUCCESS(f'Archived {rows} row(s) for {month:%Y-%m} to {path}'))
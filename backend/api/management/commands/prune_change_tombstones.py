@@ -0,0 +1,27 @@
+"""
+Management command to remove expired market deletion tombstones
+Usage: python manage.py prune_change_tombstones [--retain-days N]
+Run it daily (e.g. from a cron job). Clients whose sync cursor is older than
+the pruned tombstones get 410 from /api/markets/changes/ and resync.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.changes import prune_tombstones, pruned_through
+
+
+class Command(BaseCommand):
+    help = 'Delete market deletion tombstones older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retain-days', type=int, default=settings.CHANGES_TOMBSTONE_RETENTION_DAYS,
+            help='Days of tombstones to keep'
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(timezone.now() - timedelta(days=options['retain_days']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} tombstone(s); cursors below {pruned_through()} must resync'
+        ))
@@ -0,0 +1,30 @@
+"""
+Management command to recompute denormalized Group.member_count values
+Usage: python manage.py repair_group_member_counts [group_id ...]
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from api.models import Group
+
+
+class Command(BaseCommand):
+    help = 'Recompute Group.member_count from the members table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_ids', nargs='*', help='Only repair these groups')
+
+    def handle(self, *args, **options):
+        member_counts = (
+            Group.members.through.objects.filter(group_id=OuterRef('pk'))
+            .order_by().values('group_id').annotate(n=Count('pk')).values('n')
+        )
+        groups = Group.objects.all()
+        if options['group_ids']:
+            groups = groups.filter(pk__in=options['group_ids'])
+
+        # Only touch rows whose stored count has drifted (+1 for owner)
+        actual = Coalesce(Subquery(member_counts), 0) + 1
+        repaired = groups.exclude(member_count=actual).update(member_count=actual)
+
+        self.stdout.write(self.style.SUCCESS(f'Repaired member_count on {repaired} group(s)'))
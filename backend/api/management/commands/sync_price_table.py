@@ -0,0 +1,52 @@
+"""
+Management command that writes the shared-memory price table
+Usage: python manage.py sync_price_table [--interval SECONDS] [--reconcile SECONDS]
+Without --interval it loads the table once. With --interval it is the
+host's single price table writer: run one next to the web workers. Each
+pass applies rows changed since the last one, and every --reconcile
+seconds the whole table is resynced in case a pass missed anything.
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from api.price_table import full_sync, price_table, sync_changes
+
+
+class Command(BaseCommand):
+    help = 'Copy outcome probabilities and market volumes into the shared price table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running and apply changes every N seconds'
+        )
+        parser.add_argument(
+            '--reconcile', type=float, default=60,
+            help='With --interval, resync the whole table every N seconds'
+        )
+
+    def handle(self, *args, **options):
+        cursor, changed = full_sync()
+        price_table.touch()
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {changed} price slot(s) in {price_table.path}'
+        ))
+        if not options['interval']:
+            return
+        reconciled_at = time.monotonic()
+        while True:
+            time.sleep(options['interval'])
+            close_old_connections()
+            try:
+                if cursor is not None and time.monotonic() - reconciled_at < options['reconcile']:
+                    cursor, changed = sync_changes(cursor)
+                else:
+                    cursor, changed = full_sync()
+                    reconciled_at = time.monotonic()
+            except DatabaseError as exc:
+                # No heartbeat: readers fall back to the database once it ages out
+                self.stderr.write(f'Price table sync failed: {exc}')
+                continue
+            price_table.touch()
+            if changed:
+                self.stdout.write(f'Updated {changed} price slot(s)')
@@ -0,0 +1,99 @@
+"""
+Per-user cache of group memberships
+
+Stores the IDs of the groups a user belongs to, administers and owns so
+access checks are set lookups instead of loading a group's full M2M lists.
+Entries live in the two-tier cache (api.caching), tagged per user, and are
+dropped by m2m_changed/post_save/post_delete receivers once the change
+commits; dropping them earlier would let a concurrent reader cache the old
+memberships again.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from .caching import TieredCache, invalidate_tags
+from .models import Group
+
+MEMBERSHIP_CACHE_TIMEOUT = 300
+
+membership_cache = TieredCache('membership', MEMBERSHIP_CACHE_TIMEOUT)
+
+
+def membership_tag(user_id):
+    return f'membership:{user_id}'
+
+
+def _load_user_group_ids(user_id):
+    return {
+        'member': frozenset(
+            Group.members.through.objects.filter(user_id=user_id).values_list('group_id', flat=True)
+        ),
+        'admin': frozenset(
+            Group.admins.through.objects.filter(user_id=user_id).values_list('group_id', flat=True)
+        ),
+        'owned': frozenset(
+            Group.objects.filter(owner_id=user_id).values_list('pk', flat=True)
+        ),
+    }
+
+
+def get_user_group_ids(user):
+    """
+    Return {'member': ids, 'admin': ids, 'owned': ids} for the user.
+    Anonymous users belong to no groups.
+    """
+    if not user or not user.is_authenticated:
+        return {'member': frozenset(), 'admin': frozenset(), 'owned': frozenset()}
+    
+    return membership_cache.get_or_set(
+        user.pk, lambda: _load_user_group_ids(user.pk), tags=[membership_tag(user.pk)]
+    )
+
+
+def is_group_member(user, group):
+    """True if the user owns the group or is one of its members"""
+    if not user or not user.is_authenticated:
+        return False
+    return group.owner_id == user.pk or str(group.pk) in get_user_group_ids(user)['member']
+
+
+def is_group_admin(user, group):
+    """True if the user owns the group or is one of its admins"""
+    if not user or not user.is_authenticated:
+        return False
+    return group.owner_id == user.pk or str(group.pk) in get_user_group_ids(user)['admin']
+
+
+def invalidate_user_group_ids(user_ids):
+    """Drop cached memberships for the given users"""
+    invalidate_tags(*[membership_tag(user_id) for user_id in user_ids])
+
+
+def _invalidate_on_commit(user_ids, using):
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: invalidate_user_group_ids(user_ids), using=using)
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+@receiver(m2m_changed, sender=Group.admins.through)
+def invalidate_on_membership_change(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if reverse:
+        if action.startswith('post_'):
+            _invalidate_on_commit([instance.pk], using)
+        return
+    
+    if action == 'pre_clear':
+        # pk_set is None on clear, so remember who is about to be removed
+        instance._cleared_user_ids = list(
+            sender.objects.filter(group_id=instance.pk).values_list('user_id', flat=True)
+        )
+    elif action == 'post_clear':
+        _invalidate_on_commit(instance.__dict__.pop('_cleared_user_ids', []), using)
+    elif action in ('post_add', 'post_remove'):
+        _invalidate_on_commit(pk_set, using)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_on_group_change(sender, instance, using, **kwargs):
+    _invalidate_on_commit([instance.owner_id], using)
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.10 on 2026-10-19 02:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_auditlog_action_alter_auditlog_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='group',
+            name='privacy',
+            field=models.CharField(choices=[('PUBLIC', 'Public'), ('INVITE', 'Invite Only')], db_index=True, default='INVITE', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-created_at', '-id'], name='api_group_created_idx'),
+        ),
+    ]
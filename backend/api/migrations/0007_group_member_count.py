@@ -0,0 +1,30 @@
+# Generated by Django 5.0.10 on 2026-10-19 02:18
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_member_count(apps, schema_editor):
+    Group = apps.get_model('api', 'Group')
+    member_counts = (
+        Group.members.through.objects.filter(group_id=OuterRef('pk'))
+        .order_by().values('group_id').annotate(n=Count('pk')).values('n')
+    )
+    Group.objects.update(member_count=Coalesce(Subquery(member_counts), 0) + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_group_privacy_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='member_count',
+            field=models.PositiveIntegerField(db_index=True, default=1, editable=False),
+        ),
+        migrations.RunPython(populate_member_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.10 on 2026-10-19 02:19
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Lower
+
+
+def populate_ranking_columns(apps, schema_editor):
+    Group = apps.get_model('api', 'Group')
+    Group.objects.update(search_name=Lower('name'), last_activity_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_group_member_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='category',
+            field=models.CharField(choices=[('Education', 'Education'), ('Business', 'Business'), ('Finance', 'Finance'), ('Sports', 'Sports'), ('Crypto', 'Crypto'), ('Politics', 'Politics'), ('Other', 'Other')], db_index=True, default='Other', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-member_count', '-id'], name='api_group_members_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='api_group_activity_rank_idx'),
+        ),
+        migrations.RunPython(populate_ranking_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.10 on 2026-10-19 02:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_group_discovery_ranking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupFeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(help_text='Copied from the GroupMarket for feed ordering')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='groupmarket',
+            index=models.Index(fields=['group', '-created_at', '-id'], name='api_groupmarket_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='groupfeedentry',
+            name='group_market',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='api.groupmarket'),
+        ),
+        migrations.AddField(
+            model_name='groupfeedentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_feed_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='groupfeedentry',
+            index=models.Index(fields=['user', '-created_at', '-group_market'], name='api_feed_user_created_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupfeedentry',
+            unique_together={('user', 'group_market')},
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.10 on 2026-10-19 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Must match the expression used by AuditLogViewSet search on PostgreSQL
+AUDIT_SEARCH_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS api_audit_search_idx ON api_auditlog USING gin "
+    "(to_tsvector('simple', target_object || ' ' || coalesce(details, '')))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(AUDIT_SEARCH_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS api_audit_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_auditlog_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='api_audit_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='api_audit_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action', '-timestamp', '-id'], name='api_audit_action_ts_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,128 @@
+# Converts api_auditlog into a table partitioned by month on PostgreSQL.
+# Other databases keep a single table; see api/audit_partitions.py.
+
+from datetime import datetime, timezone as dt_timezone
+from django.db import migrations
+
+AUDIT_SEARCH_INDEX_SQL = (
+    "CREATE INDEX api_audit_search_idx ON api_auditlog USING gin "
+    "(to_tsvector('simple', target_object || ' ' || coalesce(details, '')))"
+)
+
+
+def _month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_auditlog(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    user_table = apps.get_model('auth', 'User')._meta.db_table
+    execute = schema_editor.execute
+
+    execute("ALTER TABLE api_auditlog RENAME TO api_auditlog_unpartitioned")
+    # Drop the old indexes now so their names can be reused on the new table
+    for index in ('api_audit_ts_idx', 'api_audit_user_ts_idx', 'api_audit_action_ts_idx', 'api_audit_search_idx'):
+        execute(f"DROP INDEX IF EXISTS {index}")
+
+    execute("CREATE SEQUENCE api_auditlog_partitioned_id_seq")
+    execute(
+        "CREATE TABLE api_auditlog ("
+        " id integer NOT NULL DEFAULT nextval('api_auditlog_partitioned_id_seq'),"
+        " action varchar(50) NOT NULL,"
+        " target_object varchar(255) NOT NULL,"
+        " details text NULL,"
+        " ip_address inet NULL,"
+        ' "timestamp" timestamp with time zone NOT NULL,'
+        " user_id integer NOT NULL,"
+        ' PRIMARY KEY (id, "timestamp")'
+        ') PARTITION BY RANGE ("timestamp")'
+    )
+    execute("ALTER SEQUENCE api_auditlog_partitioned_id_seq OWNED BY api_auditlog.id")
+    execute("CREATE TABLE api_auditlog_default PARTITION OF api_auditlog DEFAULT")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(timestamp) FROM api_auditlog_unpartitioned")
+        oldest = cursor.fetchone()[0]
+    now = datetime.now(dt_timezone.utc)
+    month = _month_start(oldest or now)
+    last = _add_months(_month_start(now), 3)
+    while month <= last:
+        execute(
+            f"CREATE TABLE api_auditlog_p{month:%Y%m} PARTITION OF api_auditlog "
+            "FOR VALUES FROM (%s) TO (%s)",
+            [month, _add_months(month, 1)]
+        )
+        month = _add_months(month, 1)
+
+    execute(
+        'INSERT INTO api_auditlog (id, action, target_object, details, ip_address, "timestamp", user_id) '
+        'SELECT id, action, target_object, details, ip_address, "timestamp", user_id FROM api_auditlog_unpartitioned'
+    )
+    execute(
+        "SELECT setval('api_auditlog_partitioned_id_seq', "
+        "COALESCE((SELECT max(id) FROM api_auditlog), 0) + 1, false)"
+    )
+    execute("DROP TABLE api_auditlog_unpartitioned")
+
+    execute(
+        f"ALTER TABLE api_auditlog ADD CONSTRAINT api_auditlog_user_id_fk_{user_table}_id "
+        f"FOREIGN KEY (user_id) REFERENCES {user_table} (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    execute("CREATE INDEX api_auditlog_user_id_idx ON api_auditlog (user_id)")
+    execute('CREATE INDEX api_audit_ts_idx ON api_auditlog ("timestamp" DESC, id DESC)')
+    execute('CREATE INDEX api_audit_user_ts_idx ON api_auditlog (user_id, "timestamp" DESC, id DESC)')
+    execute('CREATE INDEX api_audit_action_ts_idx ON api_auditlog (action, "timestamp" DESC, id DESC)')
+    execute(AUDIT_SEARCH_INDEX_SQL)
+
+
+def unpartition_auditlog(apps, schema_editor):
+    """Copy the partitioned rows back into a plain table as 0011 left it"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+
+    execute("ALTER TABLE api_auditlog RENAME TO api_auditlog_partitioned")
+    # Free the primary key's name (api_auditlog_pkey, or pkey1 if the old one still existed when it was created)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = 'api_auditlog_partitioned'::regclass AND contype = 'p'"
+        )
+        primary_key = cursor.fetchone()[0]
+    execute(f"ALTER TABLE api_auditlog_partitioned RENAME CONSTRAINT {primary_key} TO api_auditlog_partitioned_pkey")
+    for index in ('api_audit_ts_idx', 'api_audit_user_ts_idx', 'api_audit_action_ts_idx', 'api_audit_search_idx',
+                  'api_auditlog_user_id_idx'):
+        execute(f"DROP INDEX IF EXISTS {index}")
+
+    # The historical model carries 0011's indexes; the search index is raw SQL there too
+    schema_editor.create_model(apps.get_model('api', 'AuditLog'))
+    execute(AUDIT_SEARCH_INDEX_SQL)
+    execute(
+        'INSERT INTO api_auditlog (id, action, target_object, details, ip_address, "timestamp", user_id) '
+        'OVERRIDING SYSTEM VALUE '
+        'SELECT id, action, target_object, details, ip_address, "timestamp", user_id FROM api_auditlog_partitioned'
+    )
+    execute(
+        "SELECT setval(pg_get_serial_sequence('api_auditlog', 'id'), "
+        "COALESCE((SELECT max(id) FROM api_auditlog), 0) + 1, false)"
+    )
+    # Drops the partitions and the id sequence with it
+    execute("DROP TABLE api_auditlog_partitioned CASCADE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_auditlog_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_auditlog, unpartition_auditlog),
+    ]
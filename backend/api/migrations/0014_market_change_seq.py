@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+# Must match api.changes.CHANGE_SEQUENCE
+CHANGE_SEQUENCE = 'api_change_seq'
+
+
+def stamp_existing_rows(apps, schema_editor):
+    """Give existing markets and outcomes a sequence so a sync from 0 sees them"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {CHANGE_SEQUENCE}")
+        schema_editor.execute(f"UPDATE api_market SET change_seq = nextval('{CHANGE_SEQUENCE}')")
+        schema_editor.execute(f"UPDATE api_outcome SET change_seq = nextval('{CHANGE_SEQUENCE}')")
+        return
+    seq = 0
+    for model_name in ('Market', 'Outcome'):
+        model = apps.get_model('api', model_name)
+        rows = list(model.objects.order_by('pk').only('pk'))
+        for row in rows:
+            seq += 1
+            row.change_seq = seq
+        model.objects.bulk_update(rows, ['change_seq'], batch_size=1000)
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {CHANGE_SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_platform_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change_seq', models.BigIntegerField(db_index=True)),
+                ('kind', models.CharField(choices=[('market', 'Market'), ('outcome', 'Outcome')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('market_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='market',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='outcome',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(stamp_existing_rows, drop_sequence),
+    ]
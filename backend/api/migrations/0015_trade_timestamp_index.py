@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-19 03:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_market_change_seq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['timestamp'], name='api_trade_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.1.4 on 2026-10-19 03:16
+
+from django.db import migrations, models
+
+# Tables stamped from the change counter (see api/changes.py)
+STAMPED_TABLES = ('api_market', 'api_outcome', 'api_markettombstone')
+# Replaced by the counter; created in 0014
+CHANGE_SEQUENCE = 'api_change_seq'
+
+# Postgres: a deferred trigger stamps each row at commit. The counter row
+# stays locked until the commit finishes, so sequences become visible in
+# the order they were assigned. The trigger's own UPDATE runs at depth 1
+# and does not queue another event.
+POSTGRES_FUNCTION = """
+CREATE OR REPLACE FUNCTION api_stamp_change_seq() RETURNS trigger AS $$
+DECLARE
+    seq bigint;
+BEGIN
+    UPDATE api_marketchangecounter SET last_seq = last_seq + 1 WHERE id = 1 RETURNING last_seq INTO seq;
+    IF seq IS NULL THEN
+        INSERT INTO api_marketchangecounter (id, last_seq, pruned_through) VALUES (1, 1, 0)
+        ON CONFLICT (id) DO UPDATE SET last_seq = api_marketchangecounter.last_seq + 1
+        RETURNING last_seq INTO seq;
+    END IF;
+    EXECUTE format('UPDATE %I SET change_seq = $1 WHERE id = $2', TG_TABLE_NAME) USING seq, NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+POSTGRES_TRIGGER = """
+CREATE CONSTRAINT TRIGGER {table}_change_seq AFTER INSERT OR UPDATE ON {table}
+DEFERRABLE INITIALLY DEFERRED FOR EACH ROW WHEN (pg_trigger_depth() = 0)
+EXECUTE FUNCTION api_stamp_change_seq()
+"""
+
+# SQLite has one writer at a time, so stamping inside the statement keeps
+# commit order. Recursive triggers are off, so the inner UPDATE does not
+# fire the trigger again.
+SQLITE_TRIGGER = """
+CREATE TRIGGER {table}_change_seq_{event} AFTER {event} ON {table}
+BEGIN
+    INSERT OR IGNORE INTO api_marketchangecounter (id, last_seq, pruned_through) VALUES (1, 0, 0);
+    UPDATE api_marketchangecounter SET last_seq = last_seq + 1 WHERE id = 1;
+    UPDATE {table} SET change_seq = (SELECT last_seq FROM api_marketchangecounter WHERE id = 1) WHERE id = NEW.id;
+END
+"""
+
+
+def install_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    last_seq = 0
+    with schema_editor.connection.cursor() as cursor:
+        for table in STAMPED_TABLES:
+            cursor.execute(f"SELECT MAX(change_seq) FROM {table}")
+            last_seq = max(last_seq, cursor.fetchone()[0] or 0)
+    apps.get_model('api', 'MarketChangeCounter').objects.create(pk=1, last_seq=last_seq)
+
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FUNCTION, params=None)
+        for table in STAMPED_TABLES:
+            schema_editor.execute(POSTGRES_TRIGGER.format(table=table))
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {CHANGE_SEQUENCE}")
+    elif vendor == 'sqlite':
+        for table in STAMPED_TABLES:
+            for event in ('INSERT', 'UPDATE'):
+                schema_editor.execute(SQLITE_TRIGGER.format(table=table, event=event))
+
+
+def remove_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for table in STAMPED_TABLES:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_change_seq ON {table}")
+        schema_editor.execute("DROP FUNCTION IF EXISTS api_stamp_change_seq()")
+        last_seq = apps.get_model('api', 'MarketChangeCounter').objects.filter(pk=1).values_list(
+            'last_seq', flat=True
+        ).first() or 0
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {CHANGE_SEQUENCE}")
+        schema_editor.execute(f"SELECT setval('{CHANGE_SEQUENCE}', {last_seq + 1}, false)")
+    elif vendor == 'sqlite':
+        for table in STAMPED_TABLES:
+            for event in ('INSERT', 'UPDATE'):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_change_seq_{event}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_trade_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketChangeCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seq', models.BigIntegerField(default=0)),
+                ('pruned_through', models.BigIntegerField(default=0, help_text='Tombstones up to this sequence were pruned')),
+            ],
+        ),
+        migrations.RunPython(install_triggers, remove_triggers),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-19 03:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_market_change_counter'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='platformstats',
+            name='trade_high_water_id',
+        ),
+    ]
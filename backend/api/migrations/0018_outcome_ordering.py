@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-19 03:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_platform_stats_drop_high_water'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='outcome',
+            options={'ordering': ['id']},
+        ),
+    ]
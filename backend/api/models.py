@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
+from django.utils import timezone
 import uuid
 
 
@@ -56,12 +58,14 @@ class Market(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='Trending')
     volume = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
     endDate = models.DateTimeField()
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OPEN')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OPEN', db_index=True)
     change24h = models.FloatField(default=0.0)
     winner_id = models.CharField(max_length=50, blank=True, null=True)
     created_by = models.ForeignKey(User, related_name='created_markets', on_delete=models.SET_NULL, null=True, blank=True)
     resolved_by = models.ForeignKey(User, related_name='resolved_markets', on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Stamped from the change sequence by a database trigger (see api/changes.py)
+    change_seq = models.BigIntegerField(default=0, db_index=True)
 
     class Meta:
         permissions = [
@@ -95,8 +99,16 @@ class AuditLog(models.Model):
     target_object = models.CharField(max_length=255, help_text="String representation of the object being acted upon")
     details = models.TextField(blank=True, null=True)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the action happens, not when a batched write reaches the database
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='api_audit_ts_idx'),
+            models.Index(fields=['user', '-timestamp', '-id'], name='api_audit_user_ts_idx'),
+            models.Index(fields=['action', '-timestamp', '-id'], name='api_audit_action_ts_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.action} - {self.timestamp}"
 
@@ -104,10 +116,39 @@ class Outcome(models.Model):
     market = models.ForeignKey(Market, related_name='outcomes', on_delete=models.CASCADE)
     label = models.CharField(max_length=100)
     probability = models.FloatField(default=50.0) # 0-100
+    change_seq = models.BigIntegerField(default=0, db_index=True)
+
+    class Meta:
+        # A market's outcomes render in creation order, from the model or a projection
+        ordering = ['id']
 
     def __str__(self):
         return f"{self.label} ({self.market.title})"
 
+class MarketTombstone(models.Model):
+    """A deleted Market or Outcome, for clients syncing by change sequence"""
+    KIND_CHOICES = [
+        ('market', 'Market'),
+        ('outcome', 'Outcome'),
+    ]
+
+    change_seq = models.BigIntegerField(db_index=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    market_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at seq {self.change_seq}"
+
+class MarketChangeCounter(models.Model):
+    """Singleton row with the last change sequence assigned and the pruning watermark"""
+    last_seq = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0, help_text="Tombstones up to this sequence were pruned")
+
+    def __str__(self):
+        return f"Change sequence {self.last_seq}"
+
 class Position(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     market = models.ForeignKey(Market, on_delete=models.CASCADE)
@@ -130,6 +171,12 @@ class Trade(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=[('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='COMPLETED')
 
+    class Meta:
+        indexes = [
+            # Range scans for the dashboard rollups (api/dashboard.py)
+            models.Index(fields=['timestamp'], name='api_trade_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} {self.side} {self.shares} {self.market.title}"
 
@@ -154,28 +201,106 @@ class Group(models.Model):
     
     id = models.CharField(max_length=50, primary_key=True, default=uuid.uuid4)
     name = models.CharField(max_length=255)
+    # Lowercased name for indexed prefix search in discovery
+    search_name = models.CharField(max_length=255, db_index=True, editable=False, default='')
     description = models.TextField(blank=True)
-    category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='Other')
-    privacy = models.CharField(max_length=10, choices=PRIVACY_CHOICES, default='INVITE')
+    category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='Other', db_index=True)
+    privacy = models.CharField(max_length=10, choices=PRIVACY_CHOICES, default='INVITE', db_index=True)
     owner = models.ForeignKey(User, related_name='owned_groups', on_delete=models.CASCADE)
     members = models.ManyToManyField(User, related_name='member_groups', blank=True)
     admins = models.ManyToManyField(User, related_name='admin_groups', blank=True)
+    # Denormalized members.count() + 1 for owner, maintained by m2m_changed
+    member_count = models.PositiveIntegerField(default=1, db_index=True, editable=False)
+    # Bumped when members join or markets are added; used to rank discovery
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    def member_count(self):
-        return self.members.count() + 1  # +1 for owner
+    # Columns maintained with F()/update() outside of save()
+    DENORMALIZED_FIELDS = ('member_count', 'last_activity_at')
+    
+    def save(self, *args, **kwargs):
+        self.search_name = self.name.lower()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_name'}
+        # Never write back stale in-memory denormalized columns
+        if not self._state.adding and update_fields is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return self.name
     
     class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='api_group_created_idx'),
+            models.Index(fields=['-member_count', '-id'], name='api_group_members_rank_idx'),
+            models.Index(fields=['-last_activity_at', '-id'], name='api_group_activity_rank_idx'),
+        ]
         permissions = [
             ('can_manage_groups', 'Can manage groups'),
             ('can_approve_access', 'Can approve group access'),
         ]
 
 
+@receiver(m2m_changed, sender=Group.members.through)
+def update_group_member_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Group.member_count in step with the members M2M using F() updates"""
+    if action in ('pre_remove', 'pre_clear'):
+        # Only rows that actually exist are removed, so count them up front
+        memberships = sender.objects.all()
+        if reverse:
+            memberships = memberships.filter(user_id=instance.pk)
+            if action == 'pre_remove':
+                memberships = memberships.filter(group_id__in=pk_set)
+            instance._removed_group_ids = list(memberships.values_list('group_id', flat=True))
+        else:
+            memberships = memberships.filter(group_id=instance.pk)
+            if action == 'pre_remove':
+                memberships = memberships.filter(user_id__in=pk_set)
+            instance._removed_member_count = memberships.count()
+        return
+    if action == 'pre_add' and reverse:
+        # A new Group's pk is a UUID rather than the stored string, so Django
+        # can pass groups the user is already in; keep only the new ones
+        group_ids = {str(pk) for pk in pk_set}
+        instance._added_group_ids = group_ids - set(
+            sender.objects.filter(user_id=instance.pk, group_id__in=group_ids).values_list('group_id', flat=True)
+        )
+        return
+
+    if action == 'post_add':
+        delta = 1 if reverse else len(pk_set)
+        group_ids = instance.__dict__.pop('_added_group_ids', pk_set) if reverse else [instance.pk]
+        if delta and group_ids:
+            Group.objects.filter(pk__in=group_ids).update(
+                member_count=F('member_count') + delta,
+                last_activity_at=timezone.now(),
+            )
+            if not reverse:
+                instance.refresh_from_db(fields=['member_count', 'last_activity_at'])
+        return
+    elif action in ('post_remove', 'post_clear'):
+        if reverse:
+            delta = -1
+            group_ids = instance.__dict__.pop('_removed_group_ids', [])
+        else:
+            delta = -instance.__dict__.pop('_removed_member_count', 0)
+            group_ids = [instance.pk]
+    else:
+        return
+    
+    if not delta or not group_ids:
+        return
+    Group.objects.filter(pk__in=group_ids).update(member_count=F('member_count') + delta)
+    if not reverse:
+        instance.refresh_from_db(fields=['member_count'])
+
+
 class GroupAccessRequest(models.Model):
     """Request to join a private group"""
     STATUS_CHOICES = [
@@ -186,7 +311,7 @@ class GroupAccessRequest(models.Model):
     
     group = models.ForeignKey(Group, related_name='access_requests', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', db_index=True)
     message = models.TextField(blank=True, null=True, help_text="User's message with access request")
     requested_at = models.DateTimeField(auto_now_add=True)
     responded_at = models.DateTimeField(blank=True, null=True)
@@ -207,6 +332,66 @@ class GroupMarket(models.Model):
     
     class Meta:
         unique_together = ('group', 'market')
+        indexes = [
+            models.Index(fields=['group', '-created_at', '-id'], name='api_groupmarket_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.market.title} in {self.group.name}"
+
+
+
+class GroupFeedEntry(models.Model):
+    """Fan-out-on-write copy of a GroupMarket in one member's feed"""
+    user = models.ForeignKey(User, related_name='group_feed_entries', on_delete=models.CASCADE)
+    group_market = models.ForeignKey(GroupMarket, related_name='feed_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(help_text="Copied from the GroupMarket for feed ordering")
+    
+    class Meta:
+        unique_together = ('user', 'group_market')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-group_market'], name='api_feed_user_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.group_market} for {self.user.username}"
+
+@receiver(post_save, sender=GroupMarket)
+def touch_group_activity(sender, instance, created, **kwargs):
+    """Adding a market counts as group activity for discovery ranking"""
+    if created:
+        Group.objects.filter(pk=instance.group_id).update(last_activity_at=timezone.now())
+
+
+# Operations dashboard rollups, refreshed by `manage.py refresh_platform_stats`
+
+class PlatformStats(models.Model):
+    """Singleton row with platform gauges and the time of the last rollup refresh"""
+    open_markets = models.PositiveIntegerField(default=0)
+    pending_access_requests = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name_plural = 'platform stats'
+    
+    def __str__(self):
+        return f"Platform stats as of {self.refreshed_at}"
+
+
+class TradeHourlyRollup(models.Model):
+    """Completed trade count and volume per hour"""
+    hour = models.DateTimeField(unique=True)
+    trade_count = models.PositiveIntegerField(default=0)
+    volume = models.DecimalField(max_digits=24, decimal_places=2, default=0.00)
+    
+    def __str__(self):
+        return f"{self.hour}: {self.trade_count} trades"
+
+
+class TraderActivity(models.Model):
+    """Last completed trade per user, for counting active users"""
+    user = models.OneToOneField(User, primary_key=True, related_name='trader_activity', on_delete=models.CASCADE)
+    last_trade_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.user_id} last traded {self.last_trade_at}"
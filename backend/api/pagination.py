@@ -0,0 +1,193 @@
+"""
+Pagination classes for API list endpoints
+"""
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, Cursor, CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+from .estimates import estimate_count
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination keyed on every ordering field. DRF's CursorPagination
+    filters on the first field only and steps over ties with an offset
+    capped at offset_cutoff, so a long run of equal values (thousands of
+    groups with one member) pages forever. Here the cursor carries the
+    values of all ordering fields, the last of which must be unique, and
+    each page is a row comparison against them: no offsets.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self._following(ordering, position))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _following(self, ordering, position):
+        """Rows after `position` in `ordering`, compared field by field"""
+        condition = Q()
+        for index in reversed(range(len(ordering))):
+            field = ordering[index].lstrip('-')
+            lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+            step = Q(**{f'{field}__{lookup}': position[index]})
+            if index < len(ordering) - 1:
+                step |= Q(**{field: position[index]}) & condition
+            condition = step
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else (
+            self.cursor.position
+        )
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else (
+            self.cursor.position
+        )
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=position)
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            cursor = cursor._replace(position=json.dumps(cursor.position))
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return [
+            str(instance[field.lstrip('-')] if isinstance(instance, dict) else getattr(instance, field.lstrip('-')))
+            for field in ordering
+        ]
+
+
+class GroupCursorPagination(CursorPagination):
+    """Keyset pagination for group listings, newest first"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+
+class GroupUserCursorPagination(CursorPagination):
+    """Keyset pagination for group members and admins"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'id'
+
+
+class GroupMarketCursorPagination(CursorPagination):
+    """Keyset pagination for markets attached to a group"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+
+class GroupAccessRequestCursorPagination(CursorPagination):
+    """Keyset pagination for group access requests"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-requested_at', '-id')
+
+
+class GroupDiscoverCursorPagination(KeysetCursorPagination, GroupCursorPagination):
+    """
+    Keyset pagination for group discovery. The ranking is chosen with
+    ?ordering=members|active|newest, each backed by a composite index that
+    the (value, id) cursor walks.
+    """
+    ordering_query_param = 'ordering'
+    orderings = {
+        'members': ('-member_count', '-id'),
+        'active': ('-last_activity_at', '-id'),
+        'newest': ('-created_at', '-id'),
+    }
+    default_ordering = 'members'
+
+    def get_ordering(self, request, queryset, view):
+        ranking = request.query_params.get(self.ordering_query_param)
+        return self.orderings.get(ranking, self.orderings[self.default_ordering])
+
+
+class GroupFeedPagination(BasePagination):
+    """
+    Page size settings for the group market feed. The feed merges two
+    sources, so it pages with its own (created_at, id) keyset.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+
+class AuditLogCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the audit log, newest first. Responses carry an
+    approximate count so large result sets are never counted in full.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-timestamp', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count, self.count_is_estimate = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_is_estimate': self.count_is_estimate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
@@ -0,0 +1,239 @@
+"""
+Shared-memory market price table
+
+A fixed-layout file, memory-mapped by every worker on the host, holding a
+header and one slot per outcome ID:
+
+    header: magic | layout version | slot count | heartbeat (f64, unix time)
+    slot:   seq (u64) | outcome_id (i64) | probability (f64) | volume (i64 cents)
+            | outcome change_seq (u64) | market change_seq (u64)
+
+`volume` is the owning market's volume in fixed point, so it reads back as
+the exact Decimal the database holds (volumes beyond the i64 range are not
+stored). The two change sequences are those of the rows the values were
+copied from: live_probability() and live_volume() only return a value when
+the slot is at least as new as the row being rendered, so a row read after
+a write that the writer has not applied yet is rendered as stored.
+
+There is one writer per host: `manage.py sync_price_table --interval N`,
+started next to the web workers. It applies the rows whose change_seq moved
+since its last pass (api.changes), reconciles the whole table every
+--reconcile seconds, and stamps the heartbeat after each pass. Writes take
+an exclusive flock and use a seqlock: seq is made odd, the slot is written,
+seq is made even again. Readers never lock; they retry while seq is odd or
+changed under them, and ignore the table when the heartbeat is older than
+PRICE_TABLE_MAX_AGE, so a stopped writer means database values rather than
+stale prices.
+
+Outcome IDs index the slots directly. IDs beyond PRICE_TABLE_SLOTS are
+not stored, and readers fall back to the database values.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+from django.conf import settings
+from .models import MarketChangeCounter, MarketTombstone, Outcome
+
+MAGIC = b'KSTPRICE'
+HEADER = struct.Struct('<8sII')  # magic, layout version, slot count
+HEARTBEAT = struct.Struct('<d')
+SEQ = struct.Struct('<Q')
+BODY = struct.Struct('<qdqQQ')  # outcome_id, probability, volume in cents, outcome and market change_seq
+HEARTBEAT_OFFSET = HEADER.size
+SLOTS_OFFSET = HEADER.size + HEARTBEAT.size
+SLOT_SIZE = SEQ.size + BODY.size
+LAYOUT_VERSION = 3
+READ_RETRIES = 100
+MAX_VOLUME_CENTS = 2 ** 63 - 1
+
+Price = namedtuple('Price', ['probability', 'volume', 'outcome_seq', 'market_seq'])
+
+
+def to_cents(volume):
+    return int((Decimal(volume) * 100).to_integral_value())
+
+
+class PriceTable:
+    """One mapping of the price table file per process"""
+
+    def __init__(self, path, slots, max_age):
+        self.path = path
+        self.slots = slots
+        self.max_age = max_age
+        self._map = None
+        self._fd = None
+        self._write_lock = threading.Lock()
+        self._open_lock = threading.Lock()
+
+    def _buffer(self):
+        if self._map is None:
+            with self._open_lock:
+                if self._map is None:
+                    self._map = self._open()
+        return self._map
+
+    def _open(self):
+        size = SLOTS_OFFSET + self.slots * SLOT_SIZE
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            buf = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            magic, layout, slots = HEADER.unpack_from(buf, 0)
+            if (magic, layout, slots) != (MAGIC, LAYOUT_VERSION, self.slots):
+                # New file, or one laid out differently: start empty
+                buf[:] = bytes(size)
+                HEADER.pack_into(buf, 0, MAGIC, LAYOUT_VERSION, self.slots)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        return buf
+
+    def _offset(self, outcome_id):
+        if outcome_id is None or not 0 < outcome_id < self.slots:
+            return None
+        return SLOTS_OFFSET + outcome_id * SLOT_SIZE
+
+    def is_fresh(self):
+        """Whether the writer has stamped the table within max_age"""
+        heartbeat = HEARTBEAT.unpack_from(self._buffer(), HEARTBEAT_OFFSET)[0]
+        return time.time() - heartbeat <= self.max_age
+
+    def touch(self):
+        """Stamp the heartbeat; called by the writer after each pass"""
+        HEARTBEAT.pack_into(self._buffer(), HEARTBEAT_OFFSET, time.time())
+
+    def read(self, outcome_id):
+        """Price for the outcome, or None if the table is stale or has no entry for it"""
+        offset = self._offset(outcome_id)
+        if offset is None or not self.is_fresh():
+            return None
+        buf = self._buffer()
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            stored_id, probability, volume_cents, outcome_seq, market_seq = BODY.unpack_from(buf, offset + SEQ.size)
+            if SEQ.unpack_from(buf, offset)[0] == seq:
+                if stored_id != outcome_id:
+                    return None
+                return Price(probability, Decimal(volume_cents).scaleb(-2), outcome_seq, market_seq)
+        return None
+
+    def write_many(self, rows):
+        """
+        Store (outcome_id, probability, volume_cents, outcome_seq, market_seq)
+        rows; returns how many changed
+        """
+        buf = self._buffer()
+        changed = 0
+        with self._write_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                for row in rows:
+                    offset = self._offset(row[0])
+                    if offset is None or abs(row[2]) > MAX_VOLUME_CENTS:
+                        continue
+                    if BODY.unpack_from(buf, offset + SEQ.size) == tuple(row):
+                        continue
+                    seq = SEQ.unpack_from(buf, offset)[0]
+                    SEQ.pack_into(buf, offset, seq + 1)
+                    BODY.pack_into(buf, offset + SEQ.size, *row)
+                    SEQ.pack_into(buf, offset, seq + 2)
+                    changed += 1
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return changed
+
+    def clear(self, outcome_ids):
+        """Drop the outcomes' entries so readers fall back to the database"""
+        buf = self._buffer()
+        with self._write_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                for outcome_id in outcome_ids:
+                    offset = self._offset(outcome_id)
+                    if offset is None:
+                        continue
+                    seq = SEQ.unpack_from(buf, offset)[0]
+                    SEQ.pack_into(buf, offset, seq + 1)
+                    BODY.pack_into(buf, offset + SEQ.size, 0, 0.0, 0, 0, 0)
+                    SEQ.pack_into(buf, offset, seq + 2)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+price_table = PriceTable(settings.PRICE_TABLE_PATH, settings.PRICE_TABLE_SLOTS, settings.PRICE_TABLE_MAX_AGE)
+
+
+def read_price(outcome_id):
+    """Price from the shared table, or None when disabled, stale or missing"""
+    if not settings.PRICE_TABLE_ENABLED:
+        return None
+    return price_table.read(outcome_id)
+
+
+def live_probability(outcome_id, change_seq):
+    """The table's probability for an outcome row at `change_seq`, or None if the slot is older"""
+    price = read_price(outcome_id)
+    if price is None or price.outcome_seq < change_seq:
+        return None
+    return price.probability
+
+
+def live_volume(outcome_ids, change_seq):
+    """The table's volume for a market row at `change_seq`, from the first of its outcomes' slots that is as new"""
+    for outcome_id in outcome_ids:
+        price = read_price(outcome_id)
+        if price is not None and price.market_seq >= change_seq:
+            return price.volume
+    return None
+
+
+def sync_prices(outcomes=None):
+    """Copy probabilities and market volumes from the database into the table"""
+    if outcomes is None:
+        outcomes = Outcome.objects.all()
+    rows = outcomes.values_list(
+        'id', 'probability', 'market__volume', 'change_seq', 'market__change_seq'
+    ).iterator(chunk_size=5000)
+    return price_table.write_many(
+        (outcome_id, float(probability), to_cents(volume), outcome_seq, market_seq)
+        for outcome_id, probability, volume, outcome_seq, market_seq in rows
+    )
+
+
+def sync_changes(since):
+    """
+    Apply outcomes and markets changed after change sequence `since`, and
+    clear deleted outcomes. Returns (cursor, slots changed); the cursor is
+    None when `since` is below the pruned tombstones and a full sync is needed.
+    """
+    head, pruned_through = MarketChangeCounter.objects.filter(pk=1).values_list(
+        'last_seq', 'pruned_through'
+    ).first() or (0, 0)
+    if since < pruned_through:
+        return None, 0
+    if since >= head:
+        return since, 0
+    window = {'change_seq__gt': since, 'change_seq__lte': head}
+    changed = sync_prices(Outcome.objects.filter(**window))
+    # A market's volume is carried by every one of its outcome slots
+    changed += sync_prices(Outcome.objects.filter(
+        **{f'market__{lookup}': value for lookup, value in window.items()}
+    ))
+    deleted = list(MarketTombstone.objects.filter(kind='outcome', **window).values_list('object_id', flat=True))
+    price_table.clear(deleted)
+    return head, changed + len(deleted)
+
+
+def full_sync():
+    """Reconcile every slot with the database; returns (cursor, slots changed)"""
+    head = MarketChangeCounter.objects.filter(pk=1).values_list('last_seq', flat=True).first() or 0
+    return head, sync_prices()
@@ -0,0 +1,144 @@
+"""
+Read-only projections for hot list endpoints
+
+A Projection builds the same rows as its serializer from a .values_list()
+query, without instantiating models or walking relations per row. Each
+output field is formatted by the serializer field's own
+to_representation, resolved once per class, so the output is identical.
+Related primary keys come straight from the `_id` columns, and dotted
+sources become joins.
+
+Viewsets opt in per action with ProjectionMixin:
+
+    read_projections = {'list': MarketProjection}
+
+With api.sparse.SparseFieldsMixin, ?fields=/?exclude= narrow the column
+list and skip the outcomes query when outcomes are not requested.
+"""
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from .models import Outcome
+from .price_table import live_probability, live_volume
+from .sparse import SparseFields
+from .serializers import MarketSerializer, OutcomeSerializer, PositionSerializer, TradeSerializer
+
+
+def _identity(value):
+    return value
+
+
+class Projection:
+    serializer_class = None
+    # Output fields built by the subclass rather than from a column
+    computed_fields = ()
+
+    _getters = None
+
+    @classmethod
+    def getters(cls):
+        """[(field name, values lookup, formatter)] in serializer field order"""
+        if cls.__dict__.get('_getters') is None:
+            getters = []
+            for name, field in cls.serializer_class().fields.items():
+                if name in cls.computed_fields:
+                    continue
+                lookup = field.source.replace('.', '__')
+                if isinstance(field, PrimaryKeyRelatedField):
+                    # values() already yields the related primary key
+                    getters.append((name, lookup, _identity))
+                else:
+                    getters.append((name, lookup, field.to_representation))
+            cls._getters = getters
+        return cls._getters
+
+    @classmethod
+    def selected_getters(cls, sparse, extra=()):
+        return [getter for getter in cls.getters() if sparse.allows(getter[0]) or getter[0] in extra]
+
+    @classmethod
+    def rows(cls, queryset, sparse=None, extra=(), columns=()):
+        """Rows of the selected fields, plus `extra` fields and raw `columns` the caller drops"""
+        getters = cls.selected_getters(sparse or SparseFields(), extra)
+        getters += [(column, column, _identity) for column in columns]
+        rows = []
+        for values in queryset.values_list(*[lookup for _, lookup, _ in getters]):
+            rows.append({
+                name: None if value is None else formatter(value)
+                for (name, _, formatter), value in zip(getters, values)
+            })
+        return rows
+
+
+class OutcomeProjection(Projection):
+    serializer_class = OutcomeSerializer
+
+    @classmethod
+    def rows_by_market(cls, market_ids, sparse=None):
+        """
+        {market_id: [(outcome id, row)]} with live prices, as OutcomeSerializer
+        renders them. The ID is returned separately so it is available even
+        when it is not a selected field.
+        """
+        getters = cls.selected_getters(sparse or SparseFields())
+        grouped = {}
+        values = Outcome.objects.filter(market_id__in=market_ids).order_by('id').values_list(
+            'market_id', 'id', 'change_seq', *[lookup for _, lookup, _ in getters]
+        )
+        for market_id, outcome_id, change_seq, *columns in values:
+            row = {
+                name: None if value is None else formatter(value)
+                for (name, _, formatter), value in zip(getters, columns)
+            }
+            probability = live_probability(outcome_id, change_seq) if 'probability' in row else None
+            if probability is not None:
+                row['probability'] = probability
+            grouped.setdefault(market_id, []).append((outcome_id, row))
+        return grouped
+
+
+class MarketProjection(Projection):
+    serializer_class = MarketSerializer
+    computed_fields = ('outcomes',)
+
+    @classmethod
+    def rows(cls, queryset, sparse=None):
+        sparse = sparse or SparseFields()
+        with_outcomes = sparse.allows('outcomes')
+        if not with_outcomes:
+            return super().rows(queryset, sparse)
+        # The market ID is needed to attach outcomes even if it is not rendered
+        rows = super().rows(queryset, sparse, extra=('id',), columns=('change_seq',))
+        outcomes = OutcomeProjection.rows_by_market([row['id'] for row in rows], sparse.nested('outcomes'))
+        format_volume = MarketSerializer().fields['volume'].to_representation
+        names = [name for name in MarketSerializer().fields if sparse.allows(name)]
+        projected = []
+        for row in rows:
+            row_outcomes = outcomes.get(row['id'], [])
+            row['outcomes'] = [outcome for _, outcome in row_outcomes]
+            if 'volume' in names:
+                volume = live_volume([outcome_id for outcome_id, _ in row_outcomes], row['change_seq'])
+                if volume is not None:
+                    row['volume'] = format_volume(volume)
+            # MarketSerializer's key order, limited to the selected fields
+            projected.append({name: row[name] for name in names})
+        return projected
+
+
+class PositionProjection(Projection):
+    serializer_class = PositionSerializer
+
+
+class TradeProjection(Projection):
+    serializer_class = TradeSerializer
+
+
+class ProjectionMixin:
+    """Serve the actions in `read_projections` from a Projection instead of the serializer"""
+    read_projections = {}
+
+    def list(self, request, *args, **kwargs):
+        projection = self.read_projections.get(self.action)
+        if projection is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        sparse = self.get_sparse_fields() if hasattr(self, 'get_sparse_fields') else None
+        return Response(projection.rows(self.filter_queryset(self.get_queryset()), sparse))
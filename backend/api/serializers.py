@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Profile, Market, Outcome, Position, Trade
+from .models import Profile, Market, Outcome, Position, Trade, AuditLog
+from .price_table import live_probability, live_volume
 
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,6 +20,17 @@ class OutcomeSerializer(serializers.ModelSerializer):
         model = Outcome
         fields = ['id', 'label', 'probability']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not self.context.get('live_prices', True):
+            return data
+        # Live price from the shared table when it is newer than the row,
+        # which may come from a cache
+        probability = live_probability(instance.pk, instance.change_seq) if 'probability' in data else None
+        if probability is not None:
+            data['probability'] = probability
+        return data
+
 class MarketSerializer(serializers.ModelSerializer):
     outcomes = OutcomeSerializer(many=True)
     
@@ -26,6 +38,24 @@ class MarketSerializer(serializers.ModelSerializer):
         model = Market
         fields = ['id', 'title', 'description', 'imageUrl', 'category', 'volume', 'endDate', 'status', 'change24h', 'outcomes', 'winner_id']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'volume' not in data or not self.context.get('live_prices', True):
+            return data
+        # Every outcome slot in the price table carries the market's volume
+        volume = live_volume(self._outcome_ids(instance, data), instance.change_seq)
+        if volume is not None:
+            data['volume'] = self.fields['volume'].to_representation(volume)
+        return data
+
+    def _outcome_ids(self, instance, data):
+        """Outcome IDs already rendered or prefetched; never a new query"""
+        rows = data.get('outcomes')
+        if rows and 'id' in rows[0]:
+            return [row['id'] for row in rows]
+        prefetched = getattr(instance, '_prefetched_objects_cache', {}).get('outcomes')
+        return [outcome.pk for outcome in prefetched] if prefetched is not None else []
+
     def create(self, validated_data):
         outcomes_data = validated_data.pop('outcomes', [])
         market = Market.objects.create(**validated_data)
@@ -45,3 +75,12 @@ class TradeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Trade
         fields = '__all__'
+
+class AuditLogSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+    # DRF 3.14's IPAddressField cannot be built on Django 5.1; the log is read-only anyway
+    ip_address = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = AuditLog
+        fields = ['id', 'user', 'username', 'action', 'target_object', 'details', 'ip_address', 'timestamp']
@@ -0,0 +1,160 @@
+"""
+Sparse fieldsets: ?fields= and ?exclude=
+
+    /api/markets/?fields=id,title,outcomes.probability
+    /api/groups/?exclude=description
+
+Dotted names select or drop fields of a nested serializer. Unknown names
+are ignored. SparseFieldsMixin applies the selection to a viewset's
+serializer and queryset: unused columns are deferred with .only(), and
+select_related/prefetch_related lookups that no selected field needs are
+dropped. Projections (api.projections) take the same SparseFields.
+
+Fields that are not plain model columns (method fields, annotations) can
+declare the columns they need with Meta.sparse_sources; without that, the
+column list is left alone but relations are still pruned.
+"""
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFields:
+    """Which fields to render, with the selection for nested serializers"""
+
+    def __init__(self, fields=None, exclude=()):
+        self.fields = None
+        self.exclude = set()
+        self._nested_fields = {}
+        self._nested_exclude = {}
+        if fields is not None:
+            self.fields = set()
+            for name in fields:
+                parent, _, child = name.partition('.')
+                self.fields.add(parent)
+                if child:
+                    self._nested_fields.setdefault(parent, []).append(child)
+        for name in exclude:
+            parent, _, child = name.partition('.')
+            if child:
+                self._nested_exclude.setdefault(parent, []).append(child)
+            else:
+                self.exclude.add(parent)
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        fields = _split(params[FIELDS_PARAM]) if params.get(FIELDS_PARAM) else None
+        return cls(fields, _split(params.get(EXCLUDE_PARAM, '')))
+
+    @property
+    def limited(self):
+        return self.fields is not None or bool(self.exclude) or bool(self._nested_exclude)
+
+    def allows(self, name):
+        return (self.fields is None or name in self.fields) and name not in self.exclude
+
+    def nested(self, name):
+        return SparseFields(self._nested_fields.get(name), self._nested_exclude.get(name, ()))
+
+    def apply(self, serializer):
+        """Remove unselected fields from a serializer, recursing into nested ones"""
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        if not self.limited:
+            return serializer
+        for name in list(serializer.fields):
+            if not self.allows(name):
+                serializer.fields.pop(name)
+                continue
+            field = serializer.fields[name]
+            if isinstance(field, (serializers.ListSerializer, serializers.Serializer)):
+                self.nested(name).apply(field)
+        return serializer
+
+
+def _field_needs(serializer, name, field):
+    """(columns, relations) a rendered field reads; columns is None if unknown"""
+    sparse_sources = getattr(getattr(serializer, 'Meta', None), 'sparse_sources', {})
+    if name in sparse_sources:
+        return list(sparse_sources[name]), set()
+    if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+        return None, set()
+    path = field.source.replace('.', '__')
+    relation = path.split('__')[0]
+    if isinstance(field, (serializers.ListSerializer, serializers.Serializer, ManyRelatedField)):
+        return None, {relation}
+    return [path], {relation} if '__' in path else set()
+
+
+def prune_queryset(queryset, serializer, keep=()):
+    """
+    Limit the queryset to what the (already pruned) serializer renders.
+    `keep` lists columns that must stay loaded, e.g. pagination ordering.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    columns, relations, exact = set(keep), set(), True
+    for name, field in serializer.fields.items():
+        field_columns, field_relations = _field_needs(serializer, name, field)
+        relations |= field_relations
+        if field_columns is None:
+            exact = False
+        else:
+            columns.update(field_columns)
+
+    prefetches = queryset._prefetch_related_lookups
+    kept_prefetches = [
+        lookup for lookup in prefetches
+        if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split('__')[0] in relations
+    ]
+    if len(kept_prefetches) != len(prefetches):
+        queryset = queryset.prefetch_related(None).prefetch_related(*kept_prefetches)
+
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        kept_select = [relation for relation in select_related if relation in relations]
+        if len(kept_select) != len(select_related):
+            queryset = queryset.select_related(None)
+            if kept_select:
+                queryset = queryset.select_related(*kept_select)
+
+    if exact:
+        queryset = queryset.only('pk', *columns)
+    return queryset
+
+
+class SparseFieldsMixin:
+    """Apply ?fields=/?exclude= to the serializer and queryset of `sparse_actions`"""
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = (
+                SparseFields.from_request(self.request)
+                if self.action in self.sparse_actions else SparseFields()
+            )
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        self.get_sparse_fields().apply(serializer)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        sparse = self.get_sparse_fields()
+        if not sparse.limited:
+            return queryset
+        serializer = sparse.apply(self.get_serializer_class()(context=self.get_serializer_context()))
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return prune_queryset(queryset, serializer, keep=[field.lstrip('-') for field in ordering])
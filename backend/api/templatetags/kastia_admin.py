@@ -0,0 +1,10 @@
+from django import template
+from api.dashboard import get_platform_stats
+
+register = template.Library()
+
+
+@register.simple_tag
+def platform_stats():
+    """Operations dashboard numbers for the admin index"""
+    return get_platform_stats()
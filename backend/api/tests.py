@@ -1,3 +1,873 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from functools import partial
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.asyncio import async_unsafe
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from .audit import AuditLogWriter
+from .audit_partitions import DEFAULT_PARTITION, drop_month, ensure_partition, partition_months, stored_months
+from .bans import bulk_ban_users
+from .changes import change_head, changes_since, prune_tombstones, pruned_through
+from .dashboard import get_platform_stats, refresh_platform_stats
+from .estimates import estimate_count
+from .caching import MISSING, TieredCache, invalidate_tags, local_cache
+from .db_routers import ReplicaRouter, ReplicaRoutingMiddleware, replica_lag
+from .feed import fan_out_group_market, get_feed_page
+from .group_access import bulk_respond_access_requests
+from .invalidation import MAX_PAYLOAD_BYTES, InvalidationBus, encode_messages
+from .lookups import get_market, get_markets
+from .membership import is_group_admin
+from .price_table import HEARTBEAT, HEARTBEAT_OFFSET, PriceTable, full_sync, read_price, sync_changes
+from .serializers import MarketSerializer, PositionSerializer, TradeSerializer
+from .models import (
+    AuditLog, Group, Position, Profile, Trade, GroupAccessRequest, GroupFeedEntry, GroupMarket, Market,
+    MarketTombstone, Outcome,
+)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedTestCase(TestCase):
+    """Starts each test with both cache tiers empty; IDs are reused between tests"""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+
+class GroupQueryCountTests(CachedTestCase):
+    """A page of groups, and a group's detail, cost a constant number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer')
+        cls.owner = User.objects.create_user('owner')
+        cls.members = [User.objects.create_user(f'member{i}') for i in range(30)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def make_groups(self, count, member_count):
+        groups = []
+        for i in range(count):
+            group = Group.objects.create(name=f'Group {i}', owner=self.owner, privacy='PUBLIC')
+            group.members.add(self.user, *self.members[:member_count])
+            group.admins.add(*self.members[:member_count // 2])
+            groups.append(group)
+        return groups
+
+    def test_group_list_query_count(self):
+        self.make_groups(2, 2)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/groups/')
+        self.assertEqual(len(response.json()['results']), 2)
+
+        self.make_groups(10, 30)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/groups/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 12)
+        self.assertTrue(all(group['is_member'] and not group['is_owner'] for group in results))
+
+    def test_group_detail_query_count(self):
+        small, = self.make_groups(1, 2)
+        large, = self.make_groups(1, 30)
+        for group in (small, large):
+            # The viewer is a member but not an admin, so access requests are not queried
+            with self.assertNumQueries(8):
+                response = self.client.get(f'/api/groups/{group.pk}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['is_member'])
+
+
+class GroupDetailAccessRequestTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner')
+        self.member = User.objects.create_user('member')
+        self.group = Group.objects.create(name='Group', owner=self.owner, privacy='PUBLIC')
+        self.group.members.add(self.member)
+        GroupAccessRequest.objects.create(group=self.group, user=User.objects.create_user('requester'))
+
+    def access_requests(self, user):
+        self.client.force_login(user)
+        body = self.client.get(f'/api/groups/{self.group.pk}/').json()
+        return body['access_requests'], body['access_request_count']
+
+    def test_only_admins_see_access_requests(self):
+        self.assertEqual(self.access_requests(self.member), ([], None))
+        self.group.admins.add(self.member)
+        requests, count = self.access_requests(self.member)
+        self.assertEqual((len(requests), count), (1, 1))
+        requests, count = self.access_requests(self.owner)
+        self.assertEqual((len(requests), count), (1, 1))
+
+
+class MembershipCacheTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner')
+        self.admin = User.objects.create_user('admin')
+        self.group = Group.objects.create(name='Group', owner=self.owner)
+        self.group.admins.add(self.admin)
+
+    def test_removed_admin_is_invalidated_on_commit(self):
+        self.assertTrue(is_group_admin(self.admin, self.group))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.group.admins.remove(self.admin)
+            # Nothing is dropped until the removal commits
+            self.assertTrue(is_group_admin(self.admin, self.group))
+        self.assertTrue(callbacks)
+        self.assertFalse(is_group_admin(self.admin, self.group))
+
+
+class TieredCacheTests(CachedTestCase):
+    def test_value_loaded_across_an_invalidation_is_not_stored(self):
+        tiered = TieredCache('tiered-test')
+
+        def load():
+            # A write commits while the old value is being read
+            invalidate_tags('thing')
+            return 'old'
+        self.assertEqual(tiered.get_or_set('key', load, tags=['thing']), 'old')
+        self.assertIs(tiered.get('key', tags=['thing']), MISSING)
+        self.assertEqual(tiered.get_or_set('key', lambda: 'new', tags=['thing']), 'new')
+        self.assertEqual(tiered.get('key', tags=['thing']), 'new')
+
+    def test_market_save_invalidates_on_commit(self):
+        market = Market.objects.create(title='Old', description='', endDate=timezone.now())
+        self.assertEqual(get_market(market.pk).title, 'Old')
+        with self.captureOnCommitCallbacks(execute=True):
+            Market.objects.filter(pk=market.pk).update(title='New')
+            market.refresh_from_db()
+            market.save()
+            self.assertEqual(get_market(market.pk).title, 'Old')
+        self.assertEqual(get_market(market.pk).title, 'New')
+        self.assertEqual(get_markets([market.pk])[market.pk].title, 'New')
+
+
+class GroupFeedTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner')
+        self.member = User.objects.create_user('member')
+        self.group = Group.objects.create(name='Private', owner=self.owner)
+        self.group.members.add(self.member)
+        market = Market.objects.create(title='Secret', description='', endDate=timezone.now())
+        self.group_market = GroupMarket.objects.create(group=self.group, market=market)
+        fan_out_group_market(self.group_market)
+
+    def test_removed_member_loses_feed_entries(self):
+        self.assertEqual(get_feed_page(self.member, 10), [self.group_market])
+        self.group.members.remove(self.member)
+        self.assertFalse(GroupFeedEntry.objects.filter(user=self.member).exists())
+        self.assertTrue(GroupFeedEntry.objects.filter(user=self.owner).exists())
+
+    def test_feed_reads_only_current_groups(self):
+        # Entries left behind by a removal that skipped signals are not served
+        Group.members.through.objects.filter(user=self.member).delete()
+        cache.clear()
+        local_cache.clear()
+        self.assertEqual(get_feed_page(self.member, 10), [])
+        self.assertEqual(get_feed_page(self.owner, 10), [self.group_market])
+
+
+class BulkAccessRequestTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner')
+        self.group = Group.objects.create(name='Group', owner=self.owner)
+        self.requesters = [User.objects.create_user(f'requester{i}') for i in range(5)]
+        GroupAccessRequest.objects.bulk_create([
+            GroupAccessRequest(group=self.group, user=user) for user in self.requesters
+        ])
+
+    def test_requests_are_handled_once(self):
+        pending = GroupAccessRequest.objects.filter(group=self.group)
+        self.assertEqual(bulk_respond_access_requests(pending, 'APPROVED', self.owner), 5)
+        self.assertEqual(bulk_respond_access_requests(pending, 'APPROVED', self.owner), 0)
+        self.assertEqual(bulk_respond_access_requests(pending, 'DENIED', self.owner), 0)
+        self.assertEqual(self.group.members.count(), 5)
+        self.assertEqual(AuditLog.objects.filter(action='APPROVE_ACCESS').count(), 5)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 6)
+
+
+
+class MemberCountTests(CachedTestCase):
+    """member_count follows the members M2M from both sides (the owner counts as 1)"""
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner')
+        self.groups = [Group.objects.create(name=f'Group {i}', owner=owner) for i in range(3)]
+        self.users = [User.objects.create_user(f'member{i}') for i in range(3)]
+
+    def counts(self):
+        return [Group.objects.get(pk=group.pk).member_count for group in self.groups]
+
+    def test_forward(self):
+        group = self.groups[0]
+        group.members.add(*self.users[:2])
+        group.members.add(*self.users)  # two are members already
+        self.assertEqual(group.member_count, 4)
+        group.admins.add(self.users[0])
+        group.members.remove(self.users[0], User.objects.create_user('stranger'))
+        self.assertEqual(group.member_count, 3)
+        group.members.clear()
+        group.members.clear()
+        self.assertEqual(self.counts(), [1, 1, 1])
+
+    def test_reverse(self):
+        member, other = self.users[:2]
+        member.member_groups.add(*self.groups[:2])
+        member.member_groups.add(self.groups[0])
+        other.member_groups.add(self.groups[0])
+        self.assertEqual(self.counts(), [3, 2, 1])
+        member.member_groups.remove(self.groups[1], self.groups[2])  # not a member of the last
+        self.assertEqual(self.counts(), [3, 1, 1])
+        member.member_groups.clear()
+        self.assertEqual(self.counts(), [2, 1, 1])
+        other.member_groups.clear()
+        other.member_groups.clear()
+        self.assertEqual(self.counts(), [1, 1, 1])
+
+
+class GroupDiscoverPaginationTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('viewer')
+        self.client.force_login(self.user)
+        owner = User.objects.create_user('owner')
+        active_at = timezone.now()
+        # Far more ties than DRF's offset_cutoff of 1000
+        Group.objects.bulk_create([
+            Group(name=f'Group {i}', owner=owner, privacy='PUBLIC', last_activity_at=active_at) for i in range(1300)
+        ])
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url and pages < 20:
+            body = self.client.get(url).json()
+            ids.extend(group['id'] for group in body['results'])
+            url, pages = body['next'], pages + 1
+        return ids, body
+
+    def test_ties_are_paged_by_id(self):
+        for ranking in ('members', 'active'):
+            ids, last_page = self.walk(f'/api/groups/discover/?ordering={ranking}&page_size=200')
+            self.assertEqual(ids, sorted(Group.objects.values_list('id', flat=True), reverse=True))
+            self.assertIsNone(last_page['next'])
+            previous = self.client.get(last_page['previous']).json()
+            self.assertEqual([group['id'] for group in previous['results']], ids[-300:-100])
+
+
+class AuditLogWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('auditor')
+        self.spool_path = os.path.join(tempfile.mkdtemp(), 'audit_spool.jsonl')
+        self.writer = AuditLogWriter(batch_size=100, flush_interval=60, spool_path=self.spool_path)
+
+    def record(self, user_id, target='Group: a'):
+        return {
+            'user_id': user_id, 'action': 'OTHER', 'target_object': target, 'details': None,
+            'ip_address': None, 'timestamp': timezone.now().isoformat(),
+        }
+
+    def write_spool(self, lines):
+        with open(self.spool_path, 'w', encoding='utf-8') as spool:
+            spool.writelines(line + '\n' for line in lines)
+
+    def test_bad_spool_lines_are_quarantined(self):
+        self.write_spool([
+            json.dumps(self.record(self.user.pk, 'first')),
+            '{"user_id": 1, "acti',
+            json.dumps(self.record(999999, 'unknown user')),
+            json.dumps(self.record(self.user.pk, 'second')),
+        ])
+        self.assertEqual(self.writer.replay_spool(), 3)
+        self.assertEqual(
+            sorted(AuditLog.objects.values_list('target_object', flat=True)), ['first', 'second']
+        )
+        self.assertFalse(os.path.exists(self.spool_path))
+        with open(self.spool_path + '.rejected', encoding='utf-8') as rejected:
+            self.assertEqual(len(rejected.readlines()), 2)
+
+    def test_bad_row_does_not_block_its_batch(self):
+        entries = [AuditLog(user_id=user_id, action='OTHER', target_object='t', timestamp=timezone.now())
+                   for user_id in (self.user.pk, 999999, self.user.pk)]
+        self.writer._write(entries)
+        self.assertEqual(AuditLog.objects.count(), 2)
+        self.assertFalse(os.path.exists(self.spool_path))
+
+    def test_dead_thread_is_restarted(self):
+        dead = threading.Thread(target=lambda: None)
+        dead.start()
+        dead.join()
+        self.writer._thread, self.writer._pid = dead, os.getpid()
+        self.writer.enqueue(AuditLog(user=self.user, action='OTHER', target_object='t', timestamp=timezone.now()))
+        self.assertIsNot(self.writer._thread, dead)
+        self.assertTrue(self.writer._thread.is_alive())
+        with self.writer._cond:
+            self.writer._pending = []
+        self.writer.close()
+
+
+
+class AuditLogViewTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', is_staff=True)
+        self.trader = User.objects.create_user('trader')
+        self.start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        # Pairs of rows share a timestamp, so pages also split on id
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=self.trader if i % 3 == 0 else self.admin, action='BAN_USER' if i % 2 else 'OTHER',
+                target_object=f'Market: {i}', details='needle in the details' if i == 7 else None,
+                timestamp=self.start + timedelta(hours=i // 2),
+            )
+            for i in range(30)
+        ])
+        self.client.force_login(self.admin)
+
+    def get(self, query=''):
+        response = self.client.get(f'/api/audit-logs/{query}')
+        self.assertEqual(response.status_code, 200, query)
+        return response.json()
+
+    def test_filters(self):
+        body = self.get('?action=BAN_USER')
+        self.assertEqual(body['count'], 15)
+        self.assertEqual({row['action'] for row in body['results']}, {'BAN_USER'})
+
+        body = self.get(f'?user={self.trader.pk}&action=OTHER')
+        self.assertEqual(body['count'], 5)
+        self.assertEqual({row['user'] for row in body['results']}, {self.trader.pk})
+
+        body = self.get('?since=2026-03-01T02:00:00Z&until=2026-03-01T05:00:00Z')
+        self.assertEqual(sorted(row['target_object'] for row in body['results']),
+                         sorted(f'Market: {i}' for i in range(4, 10)))
+
+        body = self.get('?search=needle')
+        self.assertEqual([row['target_object'] for row in body['results']], ['Market: 7'])
+
+        for query in ('?user=me', '?since=yesterday'):
+            self.assertEqual(self.client.get(f'/api/audit-logs/{query}').status_code, 400, query)
+        self.client.force_login(self.trader)
+        self.assertEqual(self.client.get('/api/audit-logs/').status_code, 403)
+
+    def test_cursor_pagination(self):
+        expected = list(AuditLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        ids, url = [], '/api/audit-logs/?page_size=7'
+        while url:
+            body = self.client.get(url).json()
+            self.assertEqual((body['count'], body['count_is_estimate']), (30, False))
+            ids.extend(row['id'] for row in body['results'])
+            url = body['next']
+        self.assertEqual(ids, expected)
+        previous = self.client.get(body['previous']).json()
+        self.assertEqual([row['id'] for row in previous['results']], expected[21:28])
+
+    def test_large_counts_are_estimated(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE api_auditlog')
+        with mock.patch('api.pagination.estimate_count', partial(estimate_count, threshold=10)):
+            body = self.get('?page_size=5')
+        self.assertTrue(body['count_is_estimate'])
+        self.assertGreater(body['count'], 10)
+        self.assertEqual(len(body['results']), 5)
+
+@skipUnless(connection.vendor == 'postgresql', 'AuditLog is only partitioned on PostgreSQL')
+class AuditLogPartitionTests(TestCase):
+    def test_default_partition_rows_are_moved_and_expired(self):
+        user = User.objects.create_user('auditor')
+        # No partition covers this month, so the row lands in the DEFAULT partition
+        month = datetime(2001, 2, 1, tzinfo=dt_timezone.utc)
+        AuditLog.objects.create(user=user, action='OTHER', target_object='t', timestamp=month + timedelta(days=3))
+        self.assertEqual(stored_months(month + timedelta(days=31)), [month])
+
+        ensure_partition(month)
+        self.assertIn(month, partition_months())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {DEFAULT_PARTITION}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        drop_month(month)
+        self.assertFalse(AuditLog.objects.exists())
+
+
+class BulkBanTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', is_staff=True)
+        self.other_staff = User.objects.create_user('staff', is_staff=True)
+        self.superuser = User.objects.create_user('root', is_superuser=True)
+        self.role_admin = User.objects.create_user('role-admin')
+        Profile.objects.filter(user=self.role_admin).update(role='ADMIN')
+        self.spammers = [User.objects.create_user(f'spam{i}') for i in range(3)]
+        self.client.force_login(self.admin)
+
+    def banned_usernames(self):
+        return set(Profile.objects.filter(is_banned=True).values_list('user__username', flat=True))
+
+    def test_filter_ban_skips_admins(self):
+        response = self.client.post(
+            '/api/users/bulk-ban/', {'filter': {'joined_since': '2000-01-01'}}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(self.banned_usernames(), {'spam0', 'spam1', 'spam2'})
+
+    def test_admins_can_be_banned_by_id(self):
+        response = self.client.post(
+            '/api/users/bulk-ban/', {'user_ids': [self.other_staff.pk]}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(self.banned_usernames(), {'staff'})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs row locks')
+class ConcurrentBanTests(TransactionTestCase):
+    def test_overlapping_bans_audit_each_user_once(self):
+        admin = User.objects.create_user('admin', is_staff=True)
+        for i in range(3):
+            User.objects.create_user(f'spam{i}')
+        spammers = Profile.objects.filter(user__username__startswith='spam')
+        results = []
+
+        def ban():
+            results.append(bulk_ban_users(spammers, admin))
+            connection.close()
+        with transaction.atomic():
+            self.assertEqual(bulk_ban_users(spammers, admin), 3)
+            # The second call reads the profiles while the first is uncommitted
+            second = threading.Thread(target=ban)
+            second.start()
+            time.sleep(0.5)
+        second.join()
+        self.assertEqual(results, [0])
+        self.assertEqual(AuditLog.objects.filter(action='BAN_USER').count(), 3)
+
+
+class PlatformStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trader')
+        self.market = Market.objects.create(title='M', description='', endDate=timezone.now())
+
+    def trade(self, age):
+        trade = Trade.objects.create(
+            user=self.user, market=self.market, side='YES', shares=Decimal('1'), price=0.5, totalValue=Decimal('10.00')
+        )
+        Trade.objects.filter(pk=trade.pk).update(timestamp=timezone.now() - age)
+        return trade
+
+    def test_late_commits_are_counted(self):
+        self.trade(timedelta(minutes=2))
+        refresh_platform_stats()
+        self.assertEqual(get_platform_stats()['trades_24h'], 1)
+        # Committed after the refresh, with a timestamp before it
+        self.trade(timedelta(minutes=5))
+        self.trade(timedelta(seconds=1))
+        refresh_platform_stats()
+        refresh_platform_stats()
+        stats = get_platform_stats()
+        self.assertEqual(stats['trades_24h'], 3)
+        self.assertEqual(stats['volume_24h'], Decimal('30.00'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MarketChangesTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def seq(self, model, pk):
+        return model.objects.values_list('change_seq', flat=True).get(pk=pk)
+
+    def test_every_write_is_stamped(self):
+        market = Market.objects.create(title='M', description='', endDate=timezone.now())
+        outcome = Outcome.objects.create(market=market, label='Yes')
+        self.assertGreater(self.seq(Outcome, outcome.pk), self.seq(Market, market.pk))
+        # Queryset updates bypass save() and are stamped all the same
+        Market.objects.filter(pk=market.pk).update(title='Renamed')
+        self.assertGreater(self.seq(Market, market.pk), self.seq(Outcome, outcome.pk))
+        outcome_id = outcome.pk
+        outcome.delete()
+        tombstone = MarketTombstone.objects.get(object_id=outcome_id)
+        self.assertEqual(tombstone.change_seq, change_head())
+        cursor, has_more, markets, outcomes, tombstones = changes_since(0, 10)
+        self.assertEqual((cursor, has_more, markets, outcomes), (tombstone.change_seq, False, [market], []))
+
+    def test_cursor_below_pruned_tombstones_must_resync(self):
+        kept = Market.objects.create(title='Kept', description='', endDate=timezone.now())
+        Market.objects.create(title='Deleted', description='', endDate=timezone.now()).delete()
+        stale_cursor = self.seq(Market, kept.pk)
+        MarketTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=60))
+        self.assertEqual(prune_tombstones(timezone.now() - timedelta(days=30)), 1)
+
+        response = self.client.get(f'/api/markets/changes/?since={stale_cursor}')
+        self.assertEqual(response.status_code, 410)
+        # A full sync starts above the watermark: the kept market was re-stamped
+        response = self.client.get('/api/markets/changes/?since=0')
+        self.assertEqual([market['id'] for market in response.json()['markets']], [kept.pk])
+        self.assertGreater(response.json()['cursor'], pruned_through())
+        response = self.client.get(f"/api/markets/changes/?since={response.json()['cursor']}")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PriceTableTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.table = PriceTable(os.path.join(tempfile.mkdtemp(), 'prices.bin'), slots=1024, max_age=10)
+        patch = mock.patch('api.price_table.price_table', self.table)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.market = Market.objects.create(
+            title='M', description='', endDate=timezone.now(), volume=Decimal('1234567.89')
+        )
+        self.yes = Outcome.objects.create(market=self.market, label='Yes', probability=40.0)
+        self.no = Outcome.objects.create(market=self.market, label='No', probability=60.0)
+
+    def change_seqs(self, outcome):
+        return (
+            Outcome.objects.values_list('change_seq', flat=True).get(pk=outcome.pk),
+            Market.objects.values_list('change_seq', flat=True).get(pk=outcome.market_id),
+        )
+
+    def test_volume_is_exact_and_stale_tables_are_ignored(self):
+        cursor, _ = full_sync()
+        self.table.touch()
+        self.assertEqual(read_price(self.yes.pk), (40.0, Decimal('1234567.89'), *self.change_seqs(self.yes)))
+        HEARTBEAT.pack_into(self.table._buffer(), HEARTBEAT_OFFSET, time.time() - 60)
+        self.assertIsNone(read_price(self.yes.pk))
+
+    def test_writer_applies_changes_since_its_cursor(self):
+        cursor, _ = full_sync()
+        self.table.touch()
+        Outcome.objects.filter(pk=self.yes.pk).update(probability=45.0)
+        Market.objects.filter(pk=self.market.pk).update(volume=Decimal('1.10'))
+        no_id = self.no.pk
+        self.no.delete()
+        cursor, changed = sync_changes(cursor)
+        self.assertEqual(changed, 2)
+        self.assertEqual(read_price(self.yes.pk), (45.0, Decimal('1.10'), *self.change_seqs(self.yes)))
+        self.assertIsNone(read_price(no_id))
+        self.assertEqual(sync_changes(cursor), (cursor, 0))
+
+    def test_table_values_apply_only_to_older_rows(self):
+        cursor, _ = full_sync()
+        self.table.touch()
+        cached = Market.objects.prefetch_related('outcomes').get(pk=self.market.pk)
+        Market.objects.filter(pk=self.market.pk).update(volume=Decimal('5.00'))
+        market = Market.objects.get(pk=self.market.pk)
+        # Read after the write, the row is newer than the table and rendered as stored;
+        # one query for the outcomes field, none for the volume overlay
+        with self.assertNumQueries(1):
+            self.assertEqual(MarketSerializer(market).data['volume'], '5.00')
+        # A copy read before the write, as the cache may hold, gets the table's newer value
+        sync_changes(cursor)
+        self.assertEqual(MarketSerializer(cached).data['volume'], '5.00')
+
+    def test_write_responses_render_the_saved_row(self):
+        full_sync()
+        self.table.touch()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('editor'))
+        response = client.patch(f'/api/markets/{self.market.pk}/', {'volume': '5.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['volume'], '5.00')
+
+    def test_changes_feed_renders_stored_values(self):
+        cursor = self.client.get('/api/markets/changes/?since=0').json()['cursor']
+        full_sync()
+        self.table.touch()
+        # The writer has not seen this update: the table still holds 40.0
+        Outcome.objects.filter(pk=self.yes.pk).update(probability=90.0)
+        response = self.client.get(f'/api/markets/changes/?since={cursor}')
+        self.assertEqual([(o['id'], o['probability']) for o in response.json()['outcomes']], [(self.yes.pk, 90.0)])
+
+
+class RendererTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('trader')
+        market = Market.objects.create(
+            title='Élection 2028 — “quoted” ✓', description='Line\nbreak', endDate=timezone.now(),
+            volume=Decimal('1234567.89'),
+        )
+        outcome = Outcome.objects.create(market=market, label='Oui', probability=33.333333333333336)
+        Trade.objects.create(
+            user=self.user, market=market, outcome=outcome, side='YES', shares=Decimal('0.12345678'),
+            price=0.1 + 0.2, totalValue=Decimal('10.05'),
+        )
+        self.client.force_login(self.user)
+
+    def test_orjson_matches_drf_json_renderer(self):
+        for url in ('/api/markets/', '/api/trades/'):
+            response = self.client.get(url)
+            self.assertEqual((response['Content-Type'], len(response.data)), ('application/json', 1))
+            self.assertEqual(response.content, JSONRenderer().render(response.data), url)
+
+
+class ProjectionTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('trader')
+        for i in range(3):
+            market = Market.objects.create(title=f'M{i}', description='', endDate=timezone.now(), volume=Decimal('12.50'))
+            yes = Outcome.objects.create(market=market, label='Yes', probability=25.0)
+            Outcome.objects.create(market=market, label='No', probability=75.0)
+            Position.objects.create(user=self.user, market=market, outcome=yes, shares=Decimal('1.5'), avgPrice=0.25)
+            Trade.objects.create(
+                user=self.user, market=market, outcome=yes, side='YES', shares=Decimal('1.5'), price=0.25,
+                totalValue=Decimal('0.38'),
+            )
+            # On Postgres the updated row moves to the end of the heap; outcomes still render by id
+            Outcome.objects.filter(pk=yes.pk).update(probability=30.0)
+        self.client.force_login(self.user)
+
+    def test_projections_match_model_serializers(self):
+        cases = [
+            ('/api/markets/', MarketSerializer, Market.objects.all()),
+            ('/api/positions/', PositionSerializer, Position.objects.filter(user=self.user)),
+            ('/api/trades/', TradeSerializer, Trade.objects.all()),
+        ]
+        for url, serializer_class, queryset in cases:
+            expected = json.loads(JSONRenderer().render(serializer_class(queryset, many=True).data))
+            self.assertEqual(self.client.get(url).json(), expected, url)
+        outcomes = self.client.get('/api/markets/').json()[0]['outcomes']
+        self.assertEqual([outcome['label'] for outcome in outcomes], ['Yes', 'No'])
+
+
+
+class SparseFieldsTests(CachedTestCase):
+    """?fields=/?exclude= narrow the response and the queries behind it"""
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner')
+        for i in range(3):
+            market = Market.objects.create(title=f'M{i}', description='Long text', endDate=timezone.now())
+            Outcome.objects.create(market=market, label='Yes', probability=40.0)
+            Group.objects.create(name=f'Group {i}', description='Long text', owner=owner, privacy='PUBLIC')
+        self.client.force_login(owner)
+
+    def get(self, url, table):
+        """(response body, SQL of the queries that read `table`)"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json(), [query['sql'] for query in queries if f'FROM "{table}"' in query['sql']]
+
+    def test_market_list(self):
+        rows, queries = self.get('/api/markets/', 'api_outcome')
+        self.assertEqual((len(rows), len(queries)), (3, 1))
+
+        rows, queries = self.get('/api/markets/?fields=id,title', 'api_market')
+        self.assertEqual([set(row) for row in rows], [{'id', 'title'}] * 3)
+        market_query, = queries
+        self.assertNotIn('"description"', market_query)
+        self.assertFalse(self.get('/api/markets/?fields=id,title', 'api_outcome')[1])
+
+        rows, queries = self.get('/api/markets/?exclude=outcomes,description', 'api_market')
+        self.assertTrue(rows[0].keys() and not {'outcomes', 'description'} & rows[0].keys())
+        self.assertNotIn('"description"', queries[0])
+        self.assertFalse(self.get('/api/markets/?exclude=outcomes', 'api_outcome')[1])
+
+    def test_group_list(self):
+        body, queries = self.get('/api/groups/?fields=id,name', 'api_group')
+        self.assertEqual([set(row) for row in body['results']], [{'id', 'name'}] * 3)
+        group_query, = queries
+        # owner_name is not selected, so the owner join is dropped with it
+        self.assertNotIn('"auth_user"', group_query)
+        self.assertNotIn('"description"', group_query)
+
+        body, queries = self.get('/api/groups/?exclude=description', 'api_group')
+        self.assertNotIn('description', body['results'][0])
+        self.assertIn('owner_name', body['results'][0])
+        self.assertNotIn('"description"', queries[0])
+
+
+
+class MarketBatchTests(CachedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.markets = []
+        for i in range(4):
+            market = Market.objects.create(title=f'M{i}', description='', endDate=timezone.now())
+            Outcome.objects.create(market=market, label='Yes', probability=40.0)
+            self.markets.append(market)
+
+    def batch(self, ids):
+        response = self.client.get(f'/api/markets/batch/?ids={",".join(map(str, ids))}')
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()]
+
+    def test_requested_order_and_unknown_ids_skipped(self):
+        a, b, c, _ = (market.pk for market in self.markets)
+        self.assertEqual(self.batch([c, 999999, a, b, a]), [c, a, b])
+        rows = self.client.get(f'/api/markets/batch/?ids={a}').json()
+        self.assertEqual([outcome['label'] for outcome in rows[0]['outcomes']], ['Yes'])
+
+    def test_misses_load_in_one_query(self):
+        a, b, c, d = (market.pk for market in self.markets)
+        get_market(a)
+        # b, c and the unknown ID miss: one IN query for the markets, one for their outcomes
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.batch([a, b, 999999, c]), [a, b, c])
+        market_query, outcome_query = (query['sql'] for query in queries)
+        self.assertIn(' IN (', market_query)
+        self.assertIn('"api_outcome"', outcome_query)
+        # Found and unknown IDs are both cached now
+        with self.assertNumQueries(0):
+            self.assertEqual(self.batch([c, 999999, b, a]), [c, b, a])
+        with self.assertNumQueries(2):
+            self.assertEqual(self.batch([a, d]), [a, d])
+
+    def test_invalid_ids(self):
+        for query in ('', '?ids=', '?ids=1,x', '?ids=' + ','.join(['1'] * 201)):
+            response = self.client.get(f'/api/markets/batch/{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('error', response.json())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        patches = [
+            mock.patch('api.db_routers.replica_aliases', return_value=['replica_1', 'replica_2', 'replica_3']),
+            mock.patch('api.db_routers.healthy_replicas', return_value=['replica_1', 'replica_2', 'replica_3']),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.router = ReplicaRouter()
+
+    def aliases_during_request(self, method='get'):
+        aliases = set()
+
+        def view(request):
+            aliases.update(self.router.db_for_read(Market) for _ in range(50))
+            return HttpResponse()
+        for _ in range(5):
+            ReplicaRoutingMiddleware(view)(getattr(RequestFactory(), method)('/'))
+        return aliases
+
+    def test_one_replica_per_request(self):
+        seen = []
+
+        def view(request):
+            seen.append({self.router.db_for_read(Market) for _ in range(50)})
+            return HttpResponse()
+        for _ in range(10):
+            ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+        self.assertTrue(all(len(aliases) == 1 and 'default' not in aliases for aliases in seen))
+
+    def test_writes_read_from_primary(self):
+        self.assertEqual(self.aliases_during_request('post'), {'default'})
+
+    def test_cache_loaders_read_from_primary(self):
+        cache.clear()
+        local_cache.clear()
+        aliases = TieredCache('routing-test').get_or_set('key', lambda: self.router.db_for_read(Market))
+        self.assertEqual(aliases, 'default')
+
+
+class AsyncReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        # A Postgres replica whose cursor() refuses to run on the event loop, like Django's
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value.fetchone.return_value = (0.5,)
+        replica = mock.Mock(vendor='postgresql', cursor=async_unsafe(lambda: cursor))
+        patches = [
+            mock.patch('api.db_routers.replica_aliases', return_value=['replica_1']),
+            mock.patch('api.db_routers.connections', {'replica_1': replica, 'default': mock.Mock(in_atomic_block=False)}),
+            mock.patch.dict('api.db_routers._replica_lag', clear=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_lag_probe_runs_off_the_event_loop(self):
+        router = ReplicaRouter()
+
+        async def view(request):
+            return HttpResponse(await sync_to_async(router.db_for_read)(Market))
+        response = async_to_sync(ReplicaRoutingMiddleware(view))(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'replica_1')
+        self.assertEqual(replica_lag('replica_1'), 0.5)
+
+
+class InvalidationBusTests(SimpleTestCase):
+    """Two buses in one process stand in for two workers on the socket transport"""
+
+    def setUp(self):
+        socket_dir = tempfile.mkdtemp()
+        settings = override_settings(INVALIDATION_BUS_BACKEND='socket', INVALIDATION_BUS_SOCKET_DIR=socket_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.sender, self.receiver = InvalidationBus(flush_interval=0.2), InvalidationBus(flush_interval=0.2)
+        for bus in (self.sender, self.receiver):
+            bus.ensure_started()
+            self.addCleanup(self.stop, bus)
+        self.wait_for(lambda: len(os.listdir(socket_dir)) == 2)
+        local_cache.clear()
+
+    def stop(self, bus):
+        bus._stopping.set()
+        with bus._cond:
+            bus._cond.notify_all()
+
+    def wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'timed out')
+            time.sleep(0.01)
+
+    def test_burst_is_coalesced_and_delivered(self):
+        for key, tags in (('a', ['tag-a']), ('b', ['tag-b']), ('k', []), ('kept', ['tag-kept'])):
+            local_cache.set(key, key, ttl=60, tags=tags)
+        self.sender.publish(tags=['tag-a'])
+        self.sender.publish(tags=['tag-b', 'tag-a'])
+        self.sender.publish(keys=['k'])
+        self.wait_for(lambda: self.receiver.stats()['messages_received'])
+
+        sent, received = self.sender.stats(), self.receiver.stats()
+        self.assertEqual((sent['published'], sent['messages_sent'], sent['transport']), (3, 1, 'socket'))
+        self.assertEqual(received['messages_received'], 1)
+        self.assertGreaterEqual(received['latency_ms_last'], 0)
+        self.assertEqual([local_cache.get(key) for key in ('a', 'b', 'k')], [MISSING] * 3)
+        self.assertEqual(local_cache.get('kept'), 'kept')
+        # A bus ignores its own messages
+        time.sleep(0.3)
+        self.assertEqual(self.sender.stats()['messages_received'], 0)
+
+    def test_large_batches_are_split_under_the_payload_limit(self):
+        tags = [f'market:{i:06d}' for i in range(2000)]
+        payloads = encode_messages('origin', 0.0, tags, ['key'])
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload) <= MAX_PAYLOAD_BYTES for payload in payloads))
+        messages = [json.loads(payload) for payload in payloads]
+        self.assertEqual([tag for message in messages for tag in message['tags']], tags)
+        self.assertEqual([key for message in messages for key in message['keys']], ['key'])
@@ -1,18 +1,27 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MarketViewSet, PositionViewSet, TradeViewSet, LoginView, ChangePasswordView, UserBanView, UserUnbanView
+from .views import MarketViewSet, PositionViewSet, TradeViewSet, AuditLogViewSet, LoginView, ChangePasswordView, UserBanView, UserUnbanView, UserBulkBanView, UserBulkUnbanView
 from .group_views import GroupViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'markets', MarketViewSet)
 router.register(r'positions', PositionViewSet, basename='position')
 router.register(r'trades', TradeViewSet)
 router.register(r'groups', GroupViewSet, basename='group')
+router.register(r'audit-logs', AuditLogViewSet, basename='auditlog')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('login/', LoginView.as_view(), name='login'),
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
+    path('users/bulk-ban/', UserBulkBanView.as_view(), name='bulk-ban-users'),
+    path('users/bulk-unban/', UserBulkUnbanView.as_view(), name='bulk-unban-users'),
     path('users/<int:user_id>/ban/', UserBanView.as_view(), name='ban-user'),
     path('users/<int:user_id>/unban/', UserUnbanView.as_view(), name='unban-user'),
+    # Async read-only endpoints, served without blocking a worker under ASGI
+    path('async/markets/', async_views.market_list, name='async-market-list'),
+    path('async/markets/<int:pk>/', async_views.market_detail, name='async-market-detail'),
+    path('async/positions/', async_views.position_list, name='async-position-list'),
+    path('async/groups/', async_views.group_list, name='async-group-list'),
 ]
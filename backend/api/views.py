@@ -1,10 +1,23 @@
 from rest_framework import viewsets, permissions, status, authentication
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from .models import Market, Outcome, Position, Trade, Profile, AuditLog
-from .serializers import MarketSerializer, OutcomeSerializer, PositionSerializer, TradeSerializer, UserSerializer
+from .audit import log_action
+from .bans import bulk_ban_users, bulk_unban_users
+from .changes import change_counter, changes_since
+from .lookups import get_market, get_markets, get_profile
+from .pagination import AuditLogCursorPagination
+from .projections import MarketProjection, PositionProjection, ProjectionMixin, TradeProjection
+from .sparse import SparseFields, SparseFieldsMixin
+from .serializers import MarketSerializer, OutcomeSerializer, PositionSerializer, TradeSerializer, UserSerializer, AuditLogSerializer
 from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.http import Http404
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 
 def is_admin_user(user):
@@ -16,15 +29,81 @@ def is_admin_user(user):
     
     return user.is_superuser or user.is_staff or user.groups.filter(name='Admin').exists()
 
-class MarketViewSet(viewsets.ModelViewSet):
+class CanViewAuditLog(permissions.BasePermission):
+    """Admins and users with the view_auditlog permission (e.g. Compliance)"""
+
+    def has_permission(self, request, view):
+        return is_admin_user(request.user) or request.user.has_perm('api.view_auditlog')
+
+class MarketViewSet(SparseFieldsMixin, ProjectionMixin, viewsets.ModelViewSet):
     queryset = Market.objects.all()
     serializer_class = MarketSerializer
+    read_projections = {'list': MarketProjection}
+    sparse_actions = SparseFieldsMixin.sparse_actions + ('batch',)
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly] # Allow viewing by anyone, editing by auth
+    batch_max_ids = 200
+    changes_page_size = 500
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # A write response renders the row just saved, which the price table has not caught up with
+        context['live_prices'] = self.request.method in permissions.SAFE_METHODS
+        return context
+
+    def retrieve(self, request, *args, **kwargs):
+        # Served from the two-tier market cache
+        market = get_market(kwargs['pk']) if str(kwargs['pk']).isdigit() else None
+        if market is None:
+            raise Http404
+        return Response(self.get_serializer(market).data)
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """Markets for ?ids=1,2,3 in the requested order; unknown IDs are skipped"""
+        raw_ids = [value.strip() for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        if not raw_ids or not all(value.isdigit() for value in raw_ids):
+            return Response({'error': 'ids must be a comma-separated list of market IDs.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_ids) > self.batch_max_ids:
+            return Response({'error': f'At most {self.batch_max_ids} ids per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        markets = get_markets(raw_ids)
+        return Response(self.get_serializer(list(markets.values()), many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Markets, outcomes and deletions after ?since=<change sequence>"""
+        since = request.query_params.get('since', '0')
+        if not since.isdigit():
+            return Response({'error': 'since must be a change sequence number.'}, status=status.HTTP_400_BAD_REQUEST)
+        head, pruned_through = change_counter()
+        if 0 < int(since) < pruned_through:
+            return Response({'error': 'since is older than the retained change history; resync from since=0.'},
+                            status=status.HTTP_410_GONE)
+        cursor, has_more, markets, outcomes, tombstones = changes_since(int(since), self.changes_page_size, head)
+        # Rows are rendered as stored: a live price could be older or newer
+        # than the change_seq the cursor moves past
+        context = {'live_prices': False}
+        # Changed outcomes are listed on their own, so market rows leave them out
+        market_serializer = SparseFields(exclude=['outcomes']).apply(MarketSerializer(markets, many=True, context=context))
+        outcome_rows = OutcomeSerializer(outcomes, many=True, context=context).data
+        for outcome, row in zip(outcomes, outcome_rows):
+            row['market'] = outcome.market_id
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'markets': [market_serializer.to_representation(market) for market in markets],
+            'outcomes': outcome_rows,
+            'deleted': [
+                {'kind': tombstone.kind, 'id': tombstone.object_id, 'market': tombstone.market_id}
+                for tombstone in tombstones
+            ],
+        })
 
     def perform_create(self, serializer):
         market = serializer.save(created_by=self.request.user)
-        AuditLog.objects.create(
+        log_action(
             user=self.request.user,
             action='CREATE_MARKET',
             target_object=f"Market: {market.id} - {market.title}",
@@ -56,7 +135,7 @@ class MarketViewSet(viewsets.ModelViewSet):
         market.save()
 
         # 4. Audit Log
-        AuditLog.objects.create(
+        log_action(
             user=request.user,
             action='RESOLVE_MARKET',
             target_object=f"Market: {market.id} - {market.title}",
@@ -65,21 +144,64 @@ class MarketViewSet(viewsets.ModelViewSet):
         
         return Response({'status': 'Market resolved successfully', 'winner_id': winner_id})
 
-class PositionViewSet(viewsets.ReadOnlyModelViewSet):
+class PositionViewSet(SparseFieldsMixin, ProjectionMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = PositionSerializer
+    read_projections = {'list': PositionProjection}
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return Position.objects.filter(user=self.request.user)
 
-class TradeViewSet(viewsets.ModelViewSet):
+class TradeViewSet(SparseFieldsMixin, ProjectionMixin, viewsets.ModelViewSet):
     queryset = Trade.objects.all()
     serializer_class = TradeSerializer
+    read_projections = {'list': TradeProjection}
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only audit log for compliance. Filters: ?user=<id>, ?action=,
+    ?since= and ?until= (ISO timestamps) and ?search= over target_object
+    and details. Every filter combination is served by a composite index.
+    """
+    serializer_class = AuditLogSerializer
+    permission_classes = [permissions.IsAuthenticated, CanViewAuditLog]
+    pagination_class = AuditLogCursorPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = AuditLog.objects.select_related('user')
+
+        if params.get('user'):
+            if not params['user'].isdigit():
+                raise ValidationError({'user': 'Must be a user ID.'})
+            queryset = queryset.filter(user_id=params['user'])
+        if params.get('action'):
+            queryset = queryset.filter(action=params['action'])
+        for param, lookup in (('since', 'timestamp__gte'), ('until', 'timestamp__lt')):
+            if params.get(param):
+                value = parse_datetime(params[param])
+                if value is None:
+                    raise ValidationError({param: 'Must be an ISO 8601 timestamp.'})
+                queryset = queryset.filter(**{lookup: value})
+        if params.get('search'):
+            queryset = queryset.filter(self._search_condition(params['search']))
+        return queryset
+
+    def _search_condition(self, term):
+        if connection.vendor == 'postgresql':
+            # Same expression as the api_audit_search_idx GIN index
+            return RawSQL(
+                "to_tsvector('simple', target_object || ' ' || coalesce(details, '')) "
+                "@@ plainto_tsquery('simple', %s)",
+                [term],
+                output_field=BooleanField(),
+            )
+        return Q(target_object__icontains=term) | Q(details__icontains=term)
+
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
@@ -92,15 +214,12 @@ class LoginView(ObtainAuthToken):
         user = serializer.validated_data['user']
         
         # Check if user is banned
-        try:
-            profile = Profile.objects.get(user=user)
-            if profile.is_banned:
-                return Response(
-                    {'error': 'Your account has been banned. Please contact support.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        except Profile.DoesNotExist:
-            pass
+        profile = get_profile(user.pk)
+        if profile is not None and profile.is_banned:
+            return Response(
+                {'error': 'Your account has been banned. Please contact support.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
         token, created = Token.objects.get_or_create(user=user)
         return Response({
@@ -163,7 +282,7 @@ class UserBanView(APIView):
         profile.banned_by = request.user
         profile.save()
         
-        AuditLog.objects.create(
+        log_action(
             user=request.user,
             action='BAN_USER',
             target_object=f"User: {user.username}",
@@ -203,7 +322,7 @@ class UserUnbanView(APIView):
         profile.banned_by = None
         profile.save()
         
-        AuditLog.objects.create(
+        log_action(
             user=request.user,
             action='UNBAN_USER',
             target_object=f"User: {user.username}",
@@ -215,3 +334,64 @@ class UserUnbanView(APIView):
             'user_id': user_id,
             'username': user.username
         })
+
+
+def _bulk_ban_target_profiles(request):
+    """
+    Profiles selected by a bulk ban/unban request: either `user_ids`, or a
+    `filter` with `joined_since` (YYYY-MM-DD) and/or `username_startswith`.
+    The requesting user is never included, and filters never match admins
+    (staff, superusers, the Admin group or the ADMIN role); those can only
+    be targeted by explicit user_ids.
+    """
+    profiles = Profile.objects.exclude(user=request.user)
+    user_ids = request.data.get('user_ids')
+    filters = request.data.get('filter') or {}
+    
+    if user_ids is not None:
+        if not isinstance(user_ids, list) or not all(str(user_id).isdigit() for user_id in user_ids):
+            raise ValidationError({'user_ids': 'Must be a list of user IDs.'})
+        return profiles.filter(user_id__in=user_ids)
+    
+    if not isinstance(filters, dict) or not (filters.get('joined_since') or filters.get('username_startswith')):
+        raise ValidationError({'error': 'Provide user_ids or a filter with joined_since and/or username_startswith.'})
+    profiles = profiles.exclude(
+        Q(user__is_staff=True) | Q(user__is_superuser=True) | Q(user__groups__name='Admin') | Q(role='ADMIN')
+    )
+    if filters.get('joined_since'):
+        joined_since = parse_date(str(filters['joined_since']))
+        if joined_since is None:
+            raise ValidationError({'joined_since': 'Must be a date (YYYY-MM-DD).'})
+        profiles = profiles.filter(joinedDate__gte=joined_since)
+    if filters.get('username_startswith'):
+        profiles = profiles.filter(user__username__startswith=filters['username_startswith'])
+    return profiles
+
+
+class UserBulkBanView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        if not is_admin_user(request.user) and not request.user.has_perm('api.can_ban_users'):
+            return Response(
+                {'error': 'You do not have permission to ban users. You must be logged into Django/Supabase as admin.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        ban_reason = request.data.get('ban_reason', 'No reason provided')
+        count = bulk_ban_users(_bulk_ban_target_profiles(request), request.user, ban_reason)
+        return Response({'status': f'Banned {count} user(s) successfully', 'count': count})
+
+
+class UserBulkUnbanView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        if not is_admin_user(request.user) and not request.user.has_perm('api.can_ban_users'):
+            return Response(
+                {'error': 'You do not have permission to unban users. You must be logged into Django/Supabase as admin.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        count = bulk_unban_users(_bulk_ban_target_profiles(request), request.user)
+        return Response({'status': f'Unbanned {count} user(s) successfully', 'count': count})
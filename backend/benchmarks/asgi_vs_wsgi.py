@@ -0,0 +1,164 @@
+"""
+Read endpoints under the WSGI and ASGI deployments, side by side
+
+Usage: python benchmarks/asgi_vs_wsgi.py [--workers 2] [--duration 5] [--concurrency 1,16,64]
+
+Starts gunicorn with sync workers on core.wsgi and gunicorn with uvicorn
+workers on core.asgi, with the same number of workers, and drives
+/api/markets/ and /api/markets/<id>/ (WSGI) against /api/async/markets/
+and /api/async/markets/<id>/ (ASGI) with a fixed number of concurrent
+clients. Each list run is repeated while --slow-clients connections
+trickle their request headers, as slow mobile clients do. Reports
+throughput, latency percentiles, errors and the resident memory of each
+server (master plus workers) after the run.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import bootstrap
+
+bootstrap.setup()
+
+import httpx  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from api.models import Market, Outcome  # noqa: E402
+
+SERVERS = {
+    'wsgi': (['core.wsgi:application'], {'list': '/api/markets/', 'detail': '/api/markets/{id}/'}),
+    'asgi': (
+        ['core.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+        {'list': '/api/async/markets/', 'detail': '/api/async/markets/{id}/'},
+    ),
+}
+
+
+def seed(count):
+    if Market.objects.exists():
+        return list(Market.objects.values_list('id', flat=True))
+    markets = Market.objects.bulk_create([
+        Market(title=f'Market {i}', description='Benchmark market', category='New', endDate=timezone.now())
+        for i in range(count)
+    ])
+    Outcome.objects.bulk_create([
+        Outcome(market=market, label=label, probability=50.0) for market in markets for label in ('Yes', 'No')
+    ])
+    return [market.pk for market in markets]
+
+
+def rss_kb(pid):
+    """Resident memory of a process and its children"""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f'/proc/{current}/status') as status:
+                total += next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+            with open(f'/proc/{current}/task/{current}/children') as children:
+                pids.extend(int(child) for child in children.read().split())
+        except (FileNotFoundError, StopIteration):
+            pass
+    return total
+
+
+def start(name, port, workers):
+    app_args, _ = SERVERS[name]
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', *app_args, '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--log-level', 'warning'],
+        cwd=bootstrap.BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/health/', timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{name} server did not start')
+
+
+async def slow_client(port, deadline):
+    """Send a request one header line at a time until the deadline"""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /health/ HTTP/1.1\r\nHost: 127.0.0.1\r\n')
+        line = 0
+        while time.monotonic() < deadline:
+            writer.write(f'X-Slow-{line}: 1\r\n'.encode())
+            await writer.drain()
+            line += 1
+            await asyncio.sleep(0.5)
+        writer.close()
+    except OSError:
+        pass
+
+
+async def drive(base_url, paths, concurrency, duration, slow_clients=0):
+    samples, errors = [], 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker(offset):
+            nonlocal errors
+            index = offset
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(paths[index % len(paths)])
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                samples.append((time.perf_counter() - started) * 1000)
+                index += concurrency
+        port = int(base_url.rsplit(':', 1)[1])
+        await asyncio.gather(
+            *(worker(offset) for offset in range(concurrency)),
+            *(slow_client(port, deadline) for _ in range(slow_clients)),
+        )
+    return samples, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--concurrency', default='1,16,64')
+    parser.add_argument('--markets', type=int, default=50)
+    parser.add_argument('--slow-clients', type=int, default=4)
+    args = parser.parse_args()
+    market_ids = seed(args.markets)
+
+    for port, name in enumerate(SERVERS, start=18601):
+        process = start(name, port, args.workers)
+        try:
+            for endpoint, path in SERVERS[name][1].items():
+                paths = [path.format(id=market_id) for market_id in market_ids] if '{id}' in path else [path]
+                runs = [(int(value), 0) for value in args.concurrency.split(',')]
+                if endpoint == 'list' and args.slow_clients:
+                    runs.append((16, args.slow_clients))
+                for concurrency, slow_clients in runs:
+                    samples, errors = asyncio.run(
+                        drive(f'http://127.0.0.1:{port}', paths, concurrency, args.duration, slow_clients)
+                    )
+                    label = f'{name} {endpoint} c={concurrency}' + (f' +{slow_clients} slow' if slow_clients else '')
+                    if not samples:
+                        print(f'{label:<34}no responses, errors {errors}')
+                        continue
+                    print(bootstrap.format_row(label, bootstrap.percentiles(samples))
+                          + f'{len(samples) / args.duration:8.1f} req/s  errors {errors}')
+            print(f'{name}: {args.workers} workers, RSS {rss_kb(process.pid) / 1024:.1f} MB')
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Request latency with and without the write-behind AuditLog writer
+
+Usage: python benchmarks/audit_writer.py [--requests N]
+
+Times POST /api/groups/ (which records an audit entry) and bare
+log_action() calls, first with AUDIT_LOG_WRITE_BEHIND off (a synchronous
+INSERT and commit per entry) and then on (queued, bulk-written by the
+background thread).
+"""
+import argparse
+import time
+
+import bootstrap
+
+bootstrap.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from api.audit import audit_writer, log_action  # noqa: E402
+from api.models import AuditLog  # noqa: E402
+
+
+def timed(call, count):
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return bootstrap.percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    count = parser.parse_args().requests
+
+    user, _ = User.objects.get_or_create(username='bench-auditor')
+    client = Client()
+    client.force_login(user)
+
+    def create_group(i):
+        response = client.post('/api/groups/', {'name': f'Bench {i}', 'category': 'Other', 'owner': user.pk})
+        assert response.status_code == 201, response.content
+
+    def bare_log(i):
+        log_action(user=user, action='OTHER', target_object=f'Bench {i}')
+
+    for write_behind in (False, True):
+        with override_settings(AUDIT_LOG_WRITE_BEHIND=write_behind):
+            before = AuditLog.objects.count()
+            label = 'write-behind' if write_behind else 'synchronous'
+            print(bootstrap.format_row(f'POST /api/groups/ {label}', timed(create_group, count)))
+            print(bootstrap.format_row(f'log_action() {label}', timed(bare_log, count)))
+            audit_writer.close()
+            written = AuditLog.objects.count() - before
+            print(f'{"":<34}audit rows written: {written} of {2 * count}')
+
+
+if __name__ == '__main__':
+    main()
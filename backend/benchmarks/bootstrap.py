@@ -0,0 +1,44 @@
+"""
+Shared setup for the benchmark scripts in this directory
+
+Points Django at a throwaway SQLite database (unless BENCH_DATABASE_URL is
+set), cache directory, price table and audit spool, then migrates. Import
+it before anything that touches Django models.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = os.environ.get('BENCH_WORK_DIR') or tempfile.mkdtemp(prefix='kastia-bench-')
+
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ['DATABASE_URL'] = os.environ.get(
+    'BENCH_DATABASE_URL', f"sqlite:///{os.path.join(WORK_DIR, 'bench.sqlite3')}"
+)
+os.environ.setdefault('CACHE_DIR', os.path.join(WORK_DIR, 'cache'))
+os.environ.setdefault('PRICE_TABLE_PATH', os.path.join(WORK_DIR, 'price_table.bin'))
+os.environ.setdefault('AUDIT_LOG_SPOOL_PATH', os.path.join(WORK_DIR, 'audit_spool.jsonl'))
+os.environ.setdefault('INVALIDATION_BUS_SOCKET_DIR', os.path.join(WORK_DIR, 'bus'))
+
+
+def setup(migrate=True):
+    import django
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def percentiles(samples_ms):
+    """p50/p95/p99/max of a list of millisecond samples"""
+    ordered = sorted(samples_ms)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+    return {'p50': at(0.50), 'p95': at(0.95), 'p99': at(0.99), 'max': ordered[-1]}
+
+
+def format_row(label, stats):
+    return f"{label:<34}" + ''.join(f"{name} {value:8.3f} ms  " for name, value in stats.items())
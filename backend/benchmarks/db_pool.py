@@ -0,0 +1,133 @@
+"""
+Request throughput with and without the psycopg 3 connection pool
+
+Usage: BENCH_DATABASE_URL=postgres://... python benchmarks/db_pool.py
+           [--workers 4] [--threads 8] [--pool-max-size 4] [--duration 10] [--concurrency 32]
+
+Needs Postgres; SQLite has no connection limit to exhaust. Starts gunicorn
+with threaded workers on core.wsgi, first with DATABASE_POOL=False (one
+persistent connection per thread) and then with the pool, and drives
+/api/markets/ (a list read from the database on every request; market
+detail is served from the cache) with a fixed number of concurrent
+clients. Pick
+--workers x --threads above the server's max_connections to reproduce a
+deployment that has outgrown its connection limit. Reports throughput,
+latency percentiles, errors, the peak number of server connections and the
+pool counters from /health/.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# The benchmark process itself must not hold a pool of connections
+os.environ['DATABASE_POOL'] = 'False'
+
+import bootstrap
+
+bootstrap.setup()
+
+import httpx  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from asgi_vs_wsgi import drive, seed  # noqa: E402
+
+
+def server_setting(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SHOW {name}")
+        return int(cursor.fetchone()[0])
+
+
+def backend_count():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+        return cursor.fetchone()[0]
+
+
+def start(port, args, pooled):
+    env = dict(
+        os.environ, DATABASE_POOL=str(pooled), DATABASE_POOL_MIN_SIZE='1',
+        DATABASE_POOL_MAX_SIZE=str(args.pool_max_size), DATABASE_POOL_TIMEOUT='30',
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'core.wsgi:application', '--bind', f'127.0.0.1:{port}',
+         '--worker-class', 'gthread', '--workers', str(args.workers), '--threads', str(args.threads),
+         '--log-level', 'warning'],
+        cwd=bootstrap.BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/health/', timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('server did not start')
+
+
+def pool_totals(port, workers):
+    """Sum the /health/ pool counters over as many workers as answer"""
+    per_pid = {}
+    for _ in range(workers * 10):
+        database = httpx.get(f'http://127.0.0.1:{port}/health/', timeout=5).json()['database']
+        if database['pools']:
+            per_pid[database['pid']] = database['pools']['default']
+    totals = {}
+    for stats in per_pid.values():
+        for name in ('acquisitions', 'acquisitions_waited', 'wait_ms', 'acquisition_timeouts'):
+            totals[name] = totals.get(name, 0) + stats[name]
+    return len(per_pid), totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--pool-max-size', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--markets', type=int, default=50)
+    args = parser.parse_args()
+    if connection.vendor != 'postgresql':
+        sys.exit('Set BENCH_DATABASE_URL to a Postgres database')
+    seed(args.markets)
+    print(f"max_connections {server_setting('max_connections')}, "
+          f"superuser_reserved_connections {server_setting('superuser_reserved_connections')}, "
+          f"{args.workers} workers x {args.threads} threads, pool max_size {args.pool_max_size}")
+
+    for port, pooled in enumerate((False, True), start=18701):
+        connections.close_all()
+        process = start(port, args, pooled)
+        peak, done = [0], threading.Event()
+
+        def sample():
+            while not done.wait(0.2):
+                peak[0] = max(peak[0], backend_count())
+            connections.close_all()
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        try:
+            samples, errors = asyncio.run(
+                drive(f'http://127.0.0.1:{port}', ['/api/markets/'], args.concurrency, args.duration)
+            )
+            done.set()
+            sampler.join()
+            label = f"{'pool' if pooled else 'no pool'} c={args.concurrency}"
+            print(bootstrap.format_row(label, bootstrap.percentiles(samples))
+                  + f'{len(samples) / args.duration:8.1f} req/s  errors {errors}  peak connections {peak[0]}')
+            if pooled:
+                answered, totals = pool_totals(port, args.workers)
+                print(f'pool counters from {answered} of {args.workers} workers: {totals}')
+        finally:
+            done.set()
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
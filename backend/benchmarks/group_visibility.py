@@ -0,0 +1,173 @@
+"""
+Group visibility query at 100k groups and 10M memberships
+
+Usage: BENCH_DATABASE_URL=postgres://... python benchmarks/group_visibility.py
+           [--groups 100000] [--members-per-group 100] [--users 100000] [--samples 20]
+
+Seeds --groups groups, half of them public, each with --members-per-group
+members drawn from --users users (10M memberships with the defaults), then
+times the first page and a deep keyset page of the group list for
+--samples users, each a member of about groups x members / users groups:
+
+- OR of querysets: the original get_queryset, public | owned | member
+  querysets combined with |, which joins the members table and repeats a
+  group once per matching membership row.
+- OR + DISTINCT: the same with .distinct(), the usual fix.
+- EXISTS: GroupViewSet.get_queryset as it is now, one query with EXISTS
+  subqueries for the membership flags and no join.
+
+Also times GET /api/groups/ end to end. On Postgres the data is generated
+with generate_series in a few minutes; on SQLite it is inserted from
+Python, so use smaller arguments there.
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import bootstrap
+
+bootstrap.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from api.group_views import GroupViewSet  # noqa: E402
+from api.models import Group, Profile  # noqa: E402
+
+GROUP_PREFIX = 'bench-group-'
+USER_PREFIX = 'bench-member-'
+# Coprime with the user count, so a group's members are distinct users
+MEMBER_STRIDE = 104729
+PAGE = 51
+
+
+def seed(groups, members_per_group, users):
+    if Group.objects.filter(pk=f'{GROUP_PREFIX}0').exists():
+        return User.objects.filter(username=f'{USER_PREFIX}0').values_list('pk', flat=True).get()
+    postgres = connection.vendor == 'postgresql'
+    with connection.cursor() as cursor:
+        if postgres:
+            cursor.execute(
+                "INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, email, "
+                "is_staff, is_active, date_joined) "
+                "SELECT '!', false, %s || (n - 1), '', '', '', false, true, now() FROM generate_series(1, %s) n",
+                [USER_PREFIX, users]
+            )
+        else:
+            User.objects.bulk_create(
+                [User(username=f'{USER_PREFIX}{n}', password='!') for n in range(users)], batch_size=5000
+            )
+        first_user = User.objects.filter(username=f'{USER_PREFIX}0').values_list('pk', flat=True).get()
+
+        group_columns = (
+            'id, name, search_name, description, category, privacy, owner_id, member_count, '
+            'last_activity_at, created_at, updated_at'
+        )
+        if postgres:
+            cursor.execute(
+                f"INSERT INTO api_group ({group_columns}) "
+                "SELECT %s || g, 'Group ' || g, 'group ' || g, '', 'Other', "
+                "CASE WHEN g %% 2 = 0 THEN 'PUBLIC' ELSE 'INVITE' END, %s + g %% %s, %s, "
+                "now() - g * interval '1 second', now() - g * interval '1 second', now() "
+                "FROM generate_series(0, %s - 1) g",
+                [GROUP_PREFIX, first_user, users, members_per_group + 1, groups]
+            )
+            cursor.execute(
+                "INSERT INTO api_group_members (group_id, user_id) "
+                "SELECT %s || g, %s + (g::bigint * 7919 + k::bigint * %s) %% %s "
+                "FROM generate_series(0, %s - 1) g, generate_series(1, %s) k",
+                [GROUP_PREFIX, first_user, MEMBER_STRIDE, users, groups, members_per_group]
+            )
+            cursor.execute("ANALYZE")
+        else:
+            now = time.time()
+            cursor.executemany(
+                f"INSERT INTO api_group ({group_columns}) VALUES "
+                "(%s, %s, %s, '', 'Other', %s, %s, %s, datetime(%s, 'unixepoch'), datetime(%s, 'unixepoch'), "
+                "datetime(%s, 'unixepoch'))",
+                [
+                    (f'{GROUP_PREFIX}{g}', f'Group {g}', f'group {g}', 'PUBLIC' if g % 2 == 0 else 'INVITE',
+                     first_user + g % users, members_per_group + 1, now - g, now - g, now)
+                    for g in range(groups)
+                ]
+            )
+            for start in range(0, groups, 1000):
+                cursor.executemany(
+                    "INSERT INTO api_group_members (group_id, user_id) VALUES (%s, %s)",
+                    [
+                        (f'{GROUP_PREFIX}{g}', first_user + (g * 7919 + k * MEMBER_STRIDE) % users)
+                        for g in range(start, min(start + 1000, groups)) for k in range(1, members_per_group + 1)
+                    ]
+                )
+            cursor.execute("ANALYZE")
+    return first_user
+
+
+def or_of_querysets(user):
+    return Group.objects.filter(privacy='PUBLIC') | Group.objects.filter(owner=user) | Group.objects.filter(
+        members=user
+    )
+
+
+def exists_queryset(user):
+    view = GroupViewSet()
+    view.request = SimpleNamespace(user=user)
+    return view.get_queryset()
+
+
+QUERIES = {
+    'OR of querysets': or_of_querysets,
+    'OR + DISTINCT': lambda user: or_of_querysets(user).distinct(),
+    'EXISTS (current)': exists_queryset,
+}
+
+
+def timed(run, users):
+    samples = []
+    for user in users:
+        started = time.perf_counter()
+        run(user)
+        samples.append((time.perf_counter() - started) * 1000)
+    return bootstrap.percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--groups', type=int, default=100000)
+    parser.add_argument('--members-per-group', type=int, default=100)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    first_user = seed(args.groups, args.members_per_group, args.users)
+    memberships = Group.members.through.objects.count()
+    print(f'{Group.objects.count()} groups, {memberships} memberships, '
+          f'ready in {time.perf_counter() - started:.0f} s (seeding included), {connection.vendor}')
+
+    users = list(User.objects.filter(pk__in=[first_user + i * 997 for i in range(args.samples)]))
+    for user in users:
+        Profile.objects.get_or_create(user=user)
+    # A cursor a quarter of the way down the list, as a client paging far would hold
+    deep = Group.objects.order_by('-created_at', '-id').values_list('created_at', 'id')[args.groups // 4]
+    for name, queryset in QUERIES.items():
+        first_page = timed(lambda user: list(queryset(user).order_by('-created_at', '-id')[:PAGE]), users)
+        print(bootstrap.format_row(f'{name}, first page', first_page))
+        deep_page = timed(lambda user: list(
+            queryset(user).filter(created_at__lte=deep[0]).exclude(created_at=deep[0], id__gte=deep[1])
+            .order_by('-created_at', '-id')[:PAGE]
+        ), users)
+        print(bootstrap.format_row(f'{name}, deep page', deep_page))
+        rows = queryset(users[0]).order_by('-created_at', '-id')[:PAGE]
+        print(f'{"":<34}distinct groups on the first page: {len({group.pk for group in rows})} of {len(rows)}')
+
+    client = Client()
+
+    def list_groups(user):
+        client.force_login(user)
+        assert client.get('/api/groups/').status_code == 200
+    print(bootstrap.format_row('GET /api/groups/', timed(list_groups, users)))
+
+
+if __name__ == '__main__':
+    main()
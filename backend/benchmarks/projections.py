@@ -0,0 +1,74 @@
+"""
+ModelSerializer vs values() projection on the hot list endpoints
+
+Usage: python benchmarks/projections.py [--rows 10000] [--repeat 5]
+
+Seeds --rows markets (two outcomes each), trades and positions, then
+builds the market, position and trade list data both ways: with the
+viewset's ModelSerializer (as the list action did before) and with the
+api.projections class the action now uses. Reports the median time, the
+time per 10,000 rows and the number of queries for each, and checks that
+both produce the same rows.
+"""
+import argparse
+import statistics
+import time
+
+import bootstrap
+
+bootstrap.setup()
+
+from django.db import connection  # noqa: E402
+from api.models import Market, Position, Trade  # noqa: E402
+from api.projections import MarketProjection, PositionProjection, TradeProjection  # noqa: E402
+from api.serializers import MarketSerializer, PositionSerializer, TradeSerializer  # noqa: E402
+from asgi_vs_wsgi import seed  # noqa: E402
+from renderers import seed_trades  # noqa: E402
+
+CASES = [
+    ('markets', MarketSerializer, MarketProjection, lambda: Market.objects.order_by('id')),
+    ('positions', PositionSerializer, PositionProjection, lambda: Position.objects.order_by('id')),
+    ('trades', TradeSerializer, TradeProjection, lambda: Trade.objects.order_by('id')),
+]
+
+
+def timed(build, repeat):
+    """(median ms, query count, result) of `build` over `repeat` runs"""
+    samples, queries = [], []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+    for _ in range(repeat):
+        queries.clear()
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            result = build()
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), len(queries), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    seed(args.rows)
+    seed_trades(args.rows)
+
+    for name, serializer_class, projection, queryset in CASES:
+        rows = queryset().count()
+        serializer_ms, serializer_queries, expected = timed(
+            lambda: list(serializer_class(queryset(), many=True).data), args.repeat
+        )
+        projection_ms, projection_queries, projected = timed(lambda: projection.rows(queryset()), args.repeat)
+        assert [dict(row) for row in expected] == projected, f'{name}: projection output differs'
+        per_10k = 10000 / rows
+        print(f'{name:<10} {rows:>6} rows  '
+              f'serializer {serializer_ms * per_10k:9.1f} ms/10k ({serializer_queries} queries)  '
+              f'projection {projection_ms * per_10k:8.1f} ms/10k ({projection_queries} queries)  '
+              f'{serializer_ms / projection_ms:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Render time and payload size of the market list and trade history
+
+Usage: python benchmarks/renderers.py [--markets 1000] [--trades 10000] [--repeat 20]
+
+Builds the /api/markets/ and /api/trades/ response data once (the list
+projections the endpoints serve), then renders it with DRF's
+JSONRenderer, api.renderers.ORJSONRenderer and MessagePackRenderer.
+Reports render time percentiles over --repeat runs and the payload size
+of each. Serialization to dicts is the same for every renderer and is not
+timed here.
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+import bootstrap
+
+bootstrap.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from api.models import Market, Outcome, Position, Trade  # noqa: E402
+from api.projections import MarketProjection, TradeProjection  # noqa: E402
+from api.renderers import MessagePackRenderer, ORJSONRenderer  # noqa: E402
+from asgi_vs_wsgi import seed  # noqa: E402
+
+
+def seed_trades(count, users=20):
+    """Trades and positions spread over the seeded markets and a few users"""
+    if Trade.objects.count() >= count:
+        return
+    traders = [User.objects.get_or_create(username=f'bench-trader{i}')[0] for i in range(users)]
+    outcomes = list(Outcome.objects.values_list('id', 'market_id'))
+    rng = random.Random(42)
+    trades, positions = [], {}
+    for _ in range(count):
+        user = rng.choice(traders)
+        outcome_id, market_id = rng.choice(outcomes)
+        shares = Decimal(rng.randint(1, 10 ** 6)).scaleb(-4)
+        price = round(rng.uniform(1, 99), 2)
+        trades.append(Trade(
+            user=user, market_id=market_id, outcome_id=outcome_id, side=rng.choice(['YES', 'NO']),
+            shares=shares, price=price, totalValue=(shares * Decimal(price)).quantize(Decimal('0.01')),
+        ))
+        positions[user.pk, outcome_id] = Position(
+            user=user, market_id=market_id, outcome_id=outcome_id, shares=shares, avgPrice=price,
+        )
+    Trade.objects.bulk_create(trades, batch_size=5000)
+    Position.objects.bulk_create(positions.values(), batch_size=5000)
+
+
+RENDERERS = {
+    'DRF JSONRenderer': JSONRenderer(),
+    'ORJSONRenderer': ORJSONRenderer(),
+    'MessagePackRenderer': MessagePackRenderer(),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--markets', type=int, default=1000)
+    parser.add_argument('--trades', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    seed(args.markets)
+    seed_trades(args.trades)
+
+    payloads = {
+        f'market list ({Market.objects.count()} rows)': MarketProjection.rows(Market.objects.order_by('id')),
+        f'trade history ({Trade.objects.count()} rows)': TradeProjection.rows(Trade.objects.order_by('-id')),
+    }
+    for payload_name, data in payloads.items():
+        print(payload_name)
+        for renderer_name, renderer in RENDERERS.items():
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                body = renderer.render(data)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(bootstrap.format_row(f'  {renderer_name}', bootstrap.percentiles(samples))
+                  + f'{len(body) / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Try to load .env file if it exists (for local development)
@@ -26,6 +27,12 @@ try:
 except ImportError:
     dj_database_url = None
 
+# MessagePack responses are offered only when msgpack is installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -66,6 +73,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,6 +91,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['api.renderers.MessagePackRenderer'] if msgpack else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 CORS_ALLOW_ALL_ORIGINS = False
@@ -134,13 +152,32 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 # Use PostgreSQL if DATABASE_URL is set (production/Vercel)
 # Otherwise fall back to SQLite (local development)
+# With psycopg 3 each worker process keeps a connection pool instead of one
+# persistent connection per thread; pooling requires conn_max_age=0
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'True').lower() in ('true', '1', 'yes')
+DATABASE_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+    'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', '10')),
+    # Seconds a request waits for a free connection before failing
+    'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+    'max_idle': float(os.getenv('DATABASE_POOL_MAX_IDLE', '300')),
+}
+
+
+def _database_config(url):
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=0 if DATABASE_POOL else 600,
+        conn_health_checks=not DATABASE_POOL,
+    )
+    if DATABASE_POOL and config['ENGINE'] == 'django.db.backends.postgresql':
+        config.setdefault('OPTIONS', {})['pool'] = dict(DATABASE_POOL_OPTIONS)
+    return config
+
+
 if dj_database_url and os.getenv('DATABASE_URL'):
     DATABASES = {
-        'default': dj_database_url.config(
-            default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
-            conn_health_checks=True,
-        )
+        'default': _database_config(os.environ.get('DATABASE_URL')),
     }
 else:
     DATABASES = {
@@ -150,6 +187,84 @@ else:
         }
     }
 
+# Read replicas: comma-separated URLs, exposed as replica_1, replica_2, ...
+# GETs are routed to them by api.db_routers.ReplicaRouter; writes and
+# requests that just wrote stay on the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+if dj_database_url:
+    for _index, _url in enumerate(DATABASE_REPLICA_URLS, start=1):
+        DATABASES[f'replica_{_index}'] = _database_config(_url)
+        DATABASES[f'replica_{_index}']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['api.db_routers.ReplicaRouter']
+# Seconds a client stays pinned to the primary after a write
+DATABASE_STICKY_SECONDS = int(os.getenv('DATABASE_STICKY_SECONDS', '5'))
+# Replicas lagging further behind than this (seconds) are skipped
+DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', '10'))
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DATABASE_REPLICA_LAG_CHECK_INTERVAL', '5'))
+
+# Shared cache tier: Redis when CACHE_REDIS_URL is set, otherwise a
+# file-based cache every worker on the host can see
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# In-process tier in front of CACHES['default'] (api.caching)
+TIERED_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('TIERED_CACHE_LOCAL_MAX_ENTRIES', '10000'))
+# Longest a local entry may outlive an invalidation in another process
+TIERED_CACHE_LOCAL_TTL = float(os.getenv('TIERED_CACHE_LOCAL_TTL', '5'))
+TIERED_CACHE_JITTER = float(os.getenv('TIERED_CACHE_JITTER', '0.1'))
+# Seconds a single-flight load may hold its lock before others load too
+TIERED_CACHE_LOCK_TIMEOUT = float(os.getenv('TIERED_CACHE_LOCK_TIMEOUT', '5'))
+
+# Cross-worker invalidation of the in-process tier (api.invalidation):
+# 'auto' uses Postgres LISTEN/NOTIFY when the default database is Postgres
+# and Unix sockets otherwise; 'off' disables it
+INVALIDATION_BUS_BACKEND = os.getenv('INVALIDATION_BUS_BACKEND', 'auto')
+# Seconds invalidations are coalesced before being broadcast
+INVALIDATION_BUS_FLUSH_INTERVAL = float(os.getenv('INVALIDATION_BUS_FLUSH_INTERVAL', '0.05'))
+INVALIDATION_BUS_SOCKET_DIR = os.getenv(
+    'INVALIDATION_BUS_SOCKET_DIR', os.path.join(tempfile.gettempdir(), 'kastia-invalidation')
+)
+
+# Shared-memory price table read by every worker on the host (api.price_table),
+# written by `manage.py sync_price_table --interval N`. Deployments point
+# PRICE_TABLE_PATH at /dev/shm; use a distinct path per deployment sharing a
+# machine. Readers ignore the table if the writer's heartbeat is older than
+# PRICE_TABLE_MAX_AGE seconds.
+PRICE_TABLE_ENABLED = os.getenv('PRICE_TABLE_ENABLED', 'True').lower() in ('true', '1', 'yes')
+PRICE_TABLE_PATH = os.getenv('PRICE_TABLE_PATH', str(BASE_DIR / 'price_table.bin'))
+PRICE_TABLE_MAX_AGE = float(os.getenv('PRICE_TABLE_MAX_AGE', '10'))
+# Highest outcome ID + 1 the table can hold (40 bytes per slot)
+PRICE_TABLE_SLOTS = int(os.getenv('PRICE_TABLE_SLOTS', '262144'))
+
+# Audit log write-behind: entries are queued and bulk-inserted from a
+# background thread, falling back to a local spool file if the DB is down
+AUDIT_LOG_WRITE_BEHIND = os.getenv('AUDIT_LOG_WRITE_BEHIND', 'True').lower() in ('true', '1', 'yes')
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '100'))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '1.0'))
+AUDIT_LOG_SPOOL_PATH = os.getenv('AUDIT_LOG_SPOOL_PATH', str(BASE_DIR / 'audit_spool.jsonl'))
+
+# Audit log retention: whole months older than this are archived to
+# compressed files by `manage.py audit_log_retention` and then dropped
+AUDIT_LOG_RETENTION_MONTHS = int(os.getenv('AUDIT_LOG_RETENTION_MONTHS', '24'))
+AUDIT_LOG_ARCHIVE_DIR = os.getenv('AUDIT_LOG_ARCHIVE_DIR', str(BASE_DIR / 'audit_archive'))
+
+# Market delta sync: deletion tombstones older than this are removed by
+# `manage.py prune_change_tombstones`; clients further behind must resync
+CHANGES_TOMBSTONE_RETENTION_DAYS = int(os.getenv('CHANGES_TOMBSTONE_RETENTION_DAYS', '30'))
+
 # Supabase settings
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
@@ -19,11 +19,15 @@ from django.urls import path, include
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from api.caching import cache_stats
+from api.db_pool import pool_stats
+from api.invalidation import bus_stats
 
 # Admin Site Customization
 admin.site.site_header = "Kastia Administration"
 admin.site.site_title = "Kastia Admin Portal"
 admin.site.index_title = "Welcome to Kastia Management"
+admin.site.index_template = "admin/kastia_index.html"
 
 @require_http_methods(["GET", "OPTIONS"])
 def health(request):
@@ -36,7 +40,10 @@ def health(request):
             "admin": "/admin/",
             "api": "/api/",
             "health": "/health/"
-        }
+        },
+        "database": pool_stats(),
+        "cache": cache_stats(),
+        "invalidation": bus_stats(),
     })
 
 @require_http_methods(["GET", "OPTIONS"])